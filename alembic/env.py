@@ -10,17 +10,20 @@ from alembic import context
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
+# This line sets up loggers basically. app/alembic_runner.py turns it off so
+# that its process keeps the queue-based logging of app/core/logs.py.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from app.alembic_runner import sync_database_url
 from app.models.base import Base
 from app.models.user import User  # noqa
 from app.models.task import Task  # noqa
+from app.models.task_archive import ArchivedTask  # noqa
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -28,6 +31,19 @@ from app.models.task import Task  # noqa
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+# Migrations target DATABASE_URL, like the app, rather than the placeholder in
+# alembic.ini. The ini file interpolates "%", so it is escaped.
+config.set_main_option("sqlalchemy.url", sync_database_url().replace("%", "%%"))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Partitions of task_archive are created by app/workers/archiver.py, not
+    # by the models, so autogenerate must not try to drop them.
+    table = object if type_ == "table" else getattr(object, "table", None)
+    if reflected and table is not None and table.name.startswith("task_archive_"):
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +66,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -65,6 +82,18 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # app/alembic_runner.py passes in a connection that already holds the
+    # migration lock.
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection, target_metadata=target_metadata, include_object=include_object
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -73,7 +102,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
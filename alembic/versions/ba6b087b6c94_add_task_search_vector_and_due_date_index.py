@@ -0,0 +1,44 @@
+"""add task search vector and due date index
+
+Revision ID: ba6b087b6c94
+Revises: c9a4d8006c00
+Create Date: 2026-10-17 11:03:27.774512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'ba6b087b6c94'
+down_revision: Union[str, Sequence[str], None] = 'c9a4d8006c00'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tasks', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index(
+        'ix_tasks_search_vector', 'tasks', ['search_vector'], unique=False, postgresql_using='gin'
+    )
+    op.create_index(
+        'ix_tasks_owner_id_due_date_id', 'tasks', ['owner_id', 'due_date', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_owner_id_due_date_id', table_name='tasks')
+    op.drop_index('ix_tasks_search_vector', table_name='tasks')
+    op.drop_column('tasks', 'search_vector')
@@ -0,0 +1,43 @@
+"""add task listing and overdue indexes
+
+Revision ID: c9a4d8006c00
+Revises: 24d9712263ea
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9a4d8006c00'
+down_revision: Union[str, Sequence[str], None] = '24d9712263ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_tasks_owner_id_is_completed_id',
+        'tasks',
+        ['owner_id', 'is_completed', 'id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_tasks_due_date_open',
+        'tasks',
+        ['due_date'],
+        unique=False,
+        postgresql_where=sa.text('is_completed = false'),
+    )
+    op.drop_index(op.f('ix_tasks_title'), table_name='tasks')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_tasks_title'), 'tasks', ['title'], unique=False)
+    op.drop_index('ix_tasks_due_date_open', table_name='tasks')
+    op.drop_index('ix_tasks_owner_id_is_completed_id', table_name='tasks')
@@ -0,0 +1,35 @@
+"""add task idempotency key
+
+Revision ID: e41f0c2b7d58
+Revises: ba6b087b6c94
+Create Date: 2026-10-17 15:42:08.219634
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41f0c2b7d58'
+down_revision: Union[str, Sequence[str], None] = 'ba6b087b6c94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tasks', sa.Column('idempotency_key', sa.String(), nullable=True))
+    op.create_index(
+        'uq_tasks_owner_id_idempotency_key',
+        'tasks',
+        ['owner_id', 'idempotency_key'],
+        unique=True,
+        postgresql_where=sa.text('idempotency_key IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_tasks_owner_id_idempotency_key', table_name='tasks')
+    op.drop_column('tasks', 'idempotency_key')
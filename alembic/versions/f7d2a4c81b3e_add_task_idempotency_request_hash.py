@@ -0,0 +1,27 @@
+"""add task idempotency request hash
+
+Revision ID: f7d2a4c81b3e
+Revises: 5a7c3e9d1f24
+Create Date: 2026-10-17 18:02:44.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7d2a4c81b3e'
+down_revision: Union[str, Sequence[str], None] = '5a7c3e9d1f24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tasks', sa.Column('idempotency_request_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tasks', 'idempotency_request_hash')
@@ -1,14 +1,85 @@
+import logging
 import os
+from typing import Optional, Set
+
 from alembic import command
 from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'alembic.ini')
+# Key of the Postgres advisory lock held while migrating, so concurrent
+# runners (e.g. several containers of a rolling deploy) upgrade one at a time.
+MIGRATION_LOCK_ID = 0x7461736B6462  # "taskdb"
+
+def sync_database_url(url: Optional[str] = None) -> str:
+    """DATABASE_URL (or `url`) with the async driver swapped for psycopg2."""
+    url = make_url(url or config.DATABASE_URL).set(drivername="postgresql+psycopg2")
+    return url.render_as_string(hide_password=False)
+
+def _alembic_config() -> Config:
+    cfg = Config(ALEMBIC_INI_PATH)
+    # Keep the caller's logging setup instead of alembic.ini's handlers.
+    cfg.attributes["configure_logger"] = False
+    return cfg
 
 def run_migrations():
+    """
+    Upgrades the database to head under an advisory lock. Whoever gets the
+    lock second finds the schema already at head and does nothing.
+    """
     try:
-        print("[Alembic] Starting database migration...")
-        alembic_ini_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'alembic.ini')
-        alembic_cfg = Config(alembic_ini_path)
-        command.upgrade(alembic_cfg, 'head')
-        print("[Alembic] Migration completed successfully.")
-    except Exception as e:
-        print(f"[Alembic] Migration failed: {e}")
+        logger.info("Starting database migration")
+        alembic_cfg = _alembic_config()
+        engine = create_engine(sync_database_url())
+        try:
+            with engine.begin() as connection:
+                connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+                # alembic/env.py runs on this connection, inside the locked transaction.
+                alembic_cfg.attributes["connection"] = connection
+                command.upgrade(alembic_cfg, 'head')
+        finally:
+            engine.dispose()
+        logger.info("Migration completed successfully")
+    except Exception:
+        logger.exception("Migration failed")
         raise
+
+def head_revisions() -> Set[str]:
+    return set(ScriptDirectory.from_config(_alembic_config()).get_heads())
+
+async def current_revisions(engine: AsyncEngine) -> Set[str]:
+    """Revisions recorded in the database; empty if it was never migrated."""
+    try:
+        async with engine.connect() as connection:
+            result = await connection.execute(text("SELECT version_num FROM alembic_version"))
+            return set(result.scalars().all())
+    except DBAPIError as exc:
+        if "alembic_version" in str(exc.orig):
+            return set()
+        raise
+
+async def check_schema(engine: AsyncEngine) -> Optional[str]:
+    """
+    One query comparing the database revision with the migration scripts.
+    Returns a description of the mismatch, or None when the schema is at head.
+    """
+    current, heads = await current_revisions(engine), head_revisions()
+    if current == heads:
+        return None
+    return (
+        f"Database schema is at {', '.join(sorted(current)) or 'no revision'} but the code "
+        f"expects {', '.join(sorted(heads))}; run `python -m app.alembic_runner`."
+    )
+
+if __name__ == "__main__":
+    from app.core import logs
+
+    logs.configure_logging()
+    run_migrations()
@@ -1,38 +1,84 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import AsyncSessionLocal
+from app.core import config
 from app.core.jwt import SECRET_KEY, ALGORITHM
-from app.db import crud
+from app.core import metrics
+from app.db import rate_limit, user_cache
 from app.models.user import User
 
 bearer_scheme = HTTPBearer()
 
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
+def get_token_payload(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
-) -> User:
+) -> dict:
     token = credentials.credentials
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or not user_id.isdigit():
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = await crud.get_user_by_id(db, user_id=int(user_id))
+    return payload
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
+    payload: dict = Depends(get_token_payload)
+) -> User:
+    user = await user_cache.get_user(db, user_id=int(payload["sub"]))
     if user is None:
         raise credentials_exception
     return user
+
+async def get_current_principal(
+    db: AsyncSession = Depends(get_db),
+    payload: dict = Depends(get_token_payload)
+) -> User:
+    """
+    The current user for endpoints that only need `current_user.id`. With
+    TRUST_TOKEN_CLAIMS enabled it is built from the signed token alone,
+    without a users lookup.
+    """
+    if config.TRUST_TOKEN_CLAIMS:
+        return User(id=int(payload["sub"]), email=payload.get("email"))
+    return await get_current_user(db=db, payload=payload)
+
+async def enforce_rate_limit(scope: str, identity: str, limit: rate_limit.Limit) -> None:
+    """Raises 429 with Retry-After when `identity` is over its `scope` limit."""
+    if not config.RATE_LIMIT_ENABLED:
+        return
+    retry_after = await rate_limit.hit(scope, identity, limit)
+    if retry_after:
+        metrics.RATE_LIMITED.inc(scope=scope)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": rate_limit.retry_after_header(retry_after)},
+        )
+
+async def rate_limit_by_ip(request: Request) -> None:
+    """Limits unauthenticated endpoints per client IP."""
+    client_ip = request.client.host if request.client else "unknown"
+    await enforce_rate_limit(
+        "auth", client_ip, rate_limit.Limit(config.RATE_LIMIT_AUTH_PER_MINUTE, config.RATE_LIMIT_AUTH_BURST)
+    )
+
+async def rate_limit_by_user(payload: dict = Depends(get_token_payload)) -> None:
+    """Limits authenticated endpoints per user, from the already decoded token."""
+    await enforce_rate_limit(
+        "tasks", payload["sub"], rate_limit.Limit(config.RATE_LIMIT_TASKS_PER_MINUTE, config.RATE_LIMIT_TASKS_BURST)
+    )
@@ -4,7 +4,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import crud
 from app.schemas.user import User, UserCreate, UserLogin
 from app.api import deps
-from app.core.security import verify_password
+from app.core import config
+from app.db.rate_limit import Limit
+from app.core.security import verify_password_async
 from app.core.jwt import create_access_token, create_refresh_token
 
 router = APIRouter()
@@ -55,14 +57,21 @@ async def login(
     """
     Authenticate user and return JWT tokens.
     """
+    # Per account as well as per IP, so that guessing one account's password
+    # from many addresses is slowed down too.
+    await deps.enforce_rate_limit(
+        "login",
+        user_data.email.lower(),
+        Limit(config.RATE_LIMIT_LOGIN_PER_MINUTE, config.RATE_LIMIT_LOGIN_BURST),
+    )
     user = await crud.get_user_by_email(db, email=user_data.email)
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await verify_password_async(user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=401,
             detail="Invalid credentials"
         )
 
-    access_token = create_access_token(user.id)
+    access_token = create_access_token(user.id, email=user.email)
     refresh_token = create_refresh_token(user.id)
     
     return {
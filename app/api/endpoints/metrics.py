@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics() -> PlainTextResponse:
+    """
+    Prometheus scrape endpoint for this worker.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,14 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, List, Literal, Optional
 
-from app.db import crud
-from app.schemas.task import Task, TaskCreate, TaskUpdate
+from app.db import crud, listing_cache, task_events, task_stats
+from app.schemas.task import (
+    MAX_SEARCH_LENGTH,
+    ArchivedTask,
+    Task,
+    TaskBulkCreate,
+    TaskBulkDelete,
+    TaskBulkItemResult,
+    TaskBulkResult,
+    TaskBulkUpdate,
+    TaskCreate,
+    TaskFilter,
+    TaskStats,
+    TaskUpdate,
+)
 from app.api import deps
+from app.core import config, serialization
+from app.core.pagination import MAX_PAGE_SIZE, STREAM_CHUNK_SIZE, Cursor, encode_cursor, decode_cursor
 from app.models.user import User
 
 router = APIRouter()
 
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
 
 from fastapi import status
 
@@ -17,42 +36,436 @@ from fastapi import status
     response_model=Task,
     status_code=status.HTTP_201_CREATED,
     summary="Create a new task",
-    description="Create a new task for the current user.",
+    description=(
+        "Create a new task for the current user. Send an `Idempotency-Key` header to make "
+        "retries safe: a repeated key returns the task created by the first request, with an "
+        "`Idempotent-Replayed: true` header, instead of creating another one. Reusing a key "
+        "with a different body is rejected with 422."
+    ),
     tags=["tasks"]
 )
 async def create_task(
     *, 
     db: AsyncSession = Depends(deps.get_db),
     task_in: TaskCreate,
-    current_user: User = Depends(deps.get_current_user)
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=MAX_IDEMPOTENCY_KEY_LENGTH),
+    current_user: User = Depends(deps.get_current_principal)
 ) -> Task:
     """
     Create a new task for the current user.
     """
-    task = await crud.create_task(db, task_in=task_in, owner_id=current_user.id)
+    if idempotency_key is None:
+        return await crud.create_task(db, task_in=task_in, owner_id=current_user.id)
+    try:
+        task, created = await crud.create_task_once(
+            db, task_in=task_in, owner_id=current_user.id, idempotency_key=idempotency_key
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
     return task
 
 
+def _task_filter(
+    is_completed: Optional[bool] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    overdue: bool = False,
+    q: Optional[str] = Query(None, min_length=1, max_length=MAX_SEARCH_LENGTH),
+    sort: Literal["id", "due_date"] = "id",
+) -> TaskFilter:
+    """
+    The listing filters, declared as query parameters so that FastAPI
+    validates them and answers 422. Depends(TaskFilter) only does so while
+    FastAPI picks the constraints up from the signature Pydantic generates.
+    """
+    return TaskFilter(
+        is_completed=is_completed,
+        due_after=due_after,
+        due_before=due_before,
+        overdue=overdue,
+        q=q,
+        sort=sort,
+    )
+
+
 @router.get(
     "/",
     response_model=List[Task],
     status_code=status.HTTP_200_OK,
     summary="List tasks",
-    description="Retrieve all tasks for the current user. Optionally filter by completion status.",
+    description=(
+        "Retrieve tasks for the current user. Filter by completion status, due date range "
+        "(`due_after` inclusive, `due_before` exclusive), `overdue=true` or full-text search `q` "
+        "over title and description, and order by `id` or `due_date` (tasks without one last). "
+        "Pass `limit` to paginate; the cursor for the next page is returned in the `X-Next-Cursor` "
+        "header and is sent back as `after`. Pass `stream=true` instead of `limit` to receive all "
+        "matching tasks as newline-delimited JSON."
+    ),
     tags=["tasks"]
 )
 async def read_tasks(
     db: AsyncSession = Depends(deps.get_db),
-    is_completed: Optional[bool] = None,
-    current_user: User = Depends(deps.get_current_user)
+    filters: TaskFilter = Depends(_task_filter),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(deps.get_current_principal)
 ) -> List[Task]:
     """
     Retrieve tasks for the current user.
     """
-    tasks = await crud.get_tasks(
-        db, owner_id=current_user.id, is_completed=is_completed
+    after_cursor = None
+    if after is not None:
+        try:
+            after_cursor = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if after_cursor.sort != filters.sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match the sort order")
+
+    if stream:
+        if limit is not None:
+            raise HTTPException(status_code=400, detail="limit cannot be combined with stream")
+        return StreamingResponse(
+            _stream_tasks_ndjson(db, owner_id=current_user.id, filters=filters, after=after_cursor),
+            media_type="application/x-ndjson",
+        )
+
+    # The listing version is read before the query, so a write racing this
+    # request can only make the cached body newer than its ETag, never older.
+    # Overdue listings change with the clock rather than with writes, so they
+    # are never cached.
+    etag = None
+    if config.LISTING_ETAGS and not filters.overdue:
+        version = await listing_cache.get_version(current_user.id)
+        if version is not None:
+            etag = listing_cache.make_etag(version, filters.model_dump(), after_cursor, limit)
+            if _etag_matches(etag, if_none_match):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers=_listing_headers(etag)
+                )
+            cached = await listing_cache.get_body(current_user.id, etag)
+            if cached is not None:
+                body, next_cursor = cached
+                return _listing_response(body, etag, next_cursor)
+
+    fetch = crud.get_task_rows if config.FAST_JSON else crud.get_tasks
+    tasks = await fetch(
+        db,
+        owner_id=current_user.id,
+        filters=filters,
+        after=after_cursor,
+        limit=limit + 1 if limit is not None else None,
+    )
+    next_cursor = None
+    if limit is not None and len(tasks) > limit:
+        tasks = tasks[:limit]
+        last = tasks[-1]
+        last_id, last_due = (
+            (last["id"], last["due_date"]) if config.FAST_JSON else (last.id, last.due_date)
+        )
+        next_cursor = encode_cursor(Cursor(id=last_id, sort=filters.sort, due_date=last_due))
+    if config.FAST_JSON:
+        body = serialization.dumps_rows(tasks).decode()
+    else:
+        body = "[" + ",".join(_task_json(task) for task in tasks) + "]"
+    if etag is not None:
+        await listing_cache.set_body(current_user.id, etag, body, next_cursor)
+    return _listing_response(body, etag, next_cursor)
+
+
+def _task_json(task) -> str:
+    return Task.model_validate(task).model_dump_json()
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _listing_headers(etag: Optional[str], next_cursor: Optional[str] = None) -> dict:
+    headers = {}
+    if etag is not None:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "private, no-cache"
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return headers
+
+
+def _listing_response(body: str, etag: Optional[str], next_cursor: Optional[str]) -> Response:
+    return Response(
+        content=body, media_type="application/json", headers=_listing_headers(etag, next_cursor)
+    )
+
+
+async def _stream_tasks_ndjson(
+    db: AsyncSession, *, owner_id: int, filters: TaskFilter, after: Optional[Cursor]
+) -> AsyncIterator[bytes]:
+    # The request-scoped session is closed before the response body is sent,
+    # so the stream runs on its own session bound to the same engine.
+    async with AsyncSession(bind=db.bind, expire_on_commit=False) as session:
+        if config.FAST_JSON:
+            async for rows in crud.stream_task_rows(
+                session,
+                owner_id=owner_id,
+                filters=filters,
+                after=after,
+                chunk_size=STREAM_CHUNK_SIZE,
+            ):
+                yield serialization.dumps_rows_ndjson(rows)
+            return
+        async for chunk in crud.stream_tasks(
+            session,
+            owner_id=owner_id,
+            filters=filters,
+            after=after,
+            chunk_size=STREAM_CHUNK_SIZE,
+        ):
+            yield "".join(_task_json(task) + "\n" for task in chunk).encode()
+
+
+@router.get(
+    "/stats",
+    response_model=TaskStats,
+    status_code=status.HTTP_200_OK,
+    summary="Task statistics",
+    description=(
+        "Open, completed and overdue task counts for the current user. Pass `bucket=day` or "
+        "`bucket=week` to also get a histogram of due dates (UTC); tasks without a due date are "
+        "not part of it."
+    ),
+    tags=["tasks"]
+)
+async def read_task_stats(
+    db: AsyncSession = Depends(deps.get_db),
+    bucket: Optional[Literal["day", "week"]] = None,
+    current_user: User = Depends(deps.get_current_principal)
+) -> TaskStats:
+    """
+    Aggregate task counts for the current user.
+    """
+    if config.TASK_STATS_COUNTERS and bucket is None:
+        counts = await task_stats.get_counts(current_user.id)
+        if counts is not None:
+            return TaskStats(total=counts["open"] + counts["completed"], **counts)
+
+    stats = await crud.get_task_stats(db, owner_id=current_user.id, bucket=bucket)
+    if config.TASK_STATS_COUNTERS:
+        due = await crud.get_open_task_due_dates(db, owner_id=current_user.id)
+        await task_stats.prime(
+            current_user.id,
+            open=stats["open"],
+            completed=stats["completed"],
+            due={task_id: due_date.timestamp() for task_id, due_date in due.items()},
+        )
+    return TaskStats(**stats)
+
+
+@router.get(
+    "/archive",
+    response_model=List[ArchivedTask],
+    status_code=status.HTTP_200_OK,
+    summary="List archived tasks",
+    description=(
+        "Completed tasks that were moved to the archive, in id order. The cursor for the next "
+        "page is returned in the `X-Next-Cursor` header and is sent back as `after`."
+    ),
+    tags=["tasks"]
+)
+async def read_archived_tasks(
+    db: AsyncSession = Depends(deps.get_db),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(deps.get_current_principal)
+) -> List[ArchivedTask]:
+    """
+    Retrieve archived tasks for the current user.
+    """
+    after_cursor = None
+    if after is not None:
+        try:
+            after_cursor = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if after_cursor.sort != "id":
+            raise HTTPException(status_code=400, detail="Cursor does not match the sort order")
+
+    tasks = await crud.get_archived_tasks(
+        db, owner_id=current_user.id, after=after_cursor, limit=limit + 1
+    )
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor(Cursor(id=tasks[-1].id))
+    body = "[" + ",".join(ArchivedTask.model_validate(task).model_dump_json() for task in tasks) + "]"
+    return _listing_response(body, None, next_cursor)
+
+
+@router.get(
+    "/events",
+    status_code=status.HTTP_200_OK,
+    summary="Task change feed",
+    description=(
+        "Server-sent events for the current user's task changes: `created`, `updated`, "
+        "`completed`, `deleted` and `archived`. Reconnect with the `Last-Event-ID` header to receive the "
+        "events missed meanwhile; when they are no longer retained a `reset` event tells the "
+        "client to reload its tasks."
+    ),
+    response_class=StreamingResponse,
+    tags=["tasks"]
+)
+async def read_task_events(
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(deps.get_current_principal)
+) -> StreamingResponse:
+    """
+    Stream the current user's task changes.
+    """
+    if last_event_id is not None:
+        try:
+            task_events.parse_event_id(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    if task_events.connection_count() >= config.TASK_EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many event stream connections",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        _task_event_stream(current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event_id: Optional[str], data: str) -> str:
+    return f"id: {event_id}\ndata: {data}\n\n" if event_id is not None else f"data: {data}\n\n"
+
+
+async def _task_event_stream(owner_id: int, last_event_id: Optional[str]) -> AsyncIterator[str]:
+    # Subscribe before reading the missed events, so nothing published in
+    # between is lost; live events already sent from history are skipped.
+    async with task_events.subscribe(owner_id) as subscription:
+        seen = None
+        if last_event_id is not None:
+            missed = await task_events.history(owner_id, last_event_id)
+            if missed is None:
+                yield _sse(None, '{"type":"reset"}')
+            else:
+                for event_id, data in missed:
+                    yield _sse(event_id, data)
+                seen = task_events.parse_event_id(missed[-1][0] if missed else last_event_id)
+        while True:
+            item = await subscription.get(timeout=config.TASK_EVENTS_HEARTBEAT_SECONDS)
+            if item is None:
+                if subscription.lost.is_set():
+                    # The client reconnects with its last event id and catches up.
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            event_id, data = item
+            if seen is not None and task_events.parse_event_id(event_id) <= seen:
+                continue
+            yield _sse(event_id, data)
+
+
+@router.post(
+    "/bulk",
+    response_model=TaskBulkResult,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create tasks in bulk",
+    description="Create many tasks for the current user in a single transaction.",
+    tags=["tasks"]
+)
+async def create_tasks_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    bulk_in: TaskBulkCreate,
+    current_user: User = Depends(deps.get_current_principal)
+) -> TaskBulkResult:
+    """
+    Create many tasks for the current user.
+    """
+    rows = await crud.create_tasks(db, tasks_in=bulk_in.tasks, owner_id=current_user.id)
+    return TaskBulkResult(
+        results=[
+            TaskBulkItemResult(id=row.id, status="created", task=Task.model_validate(row))
+            for row in rows
+        ]
+    )
+
+
+@router.patch(
+    "/bulk",
+    response_model=TaskBulkResult,
+    status_code=status.HTTP_200_OK,
+    summary="Update tasks in bulk",
+    description=(
+        "Apply the same changes to many tasks of the current user in a single transaction. "
+        "Ids that do not exist or belong to another user are reported as `not_found`."
+    ),
+    tags=["tasks"]
+)
+async def update_tasks_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    bulk_in: TaskBulkUpdate,
+    current_user: User = Depends(deps.get_current_principal)
+) -> TaskBulkResult:
+    """
+    Update many tasks of the current user.
+    """
+    if not bulk_in.changes.dict(exclude_unset=True):
+        raise HTTPException(status_code=400, detail="No fields to update")
+    rows = await crud.update_tasks(
+        db, ids=bulk_in.ids, owner_id=current_user.id, task_in=bulk_in.changes
+    )
+    updated = {row.id: Task.model_validate(row) for row in rows}
+    return TaskBulkResult(
+        results=[
+            TaskBulkItemResult(id=task_id, status="updated", task=updated[task_id])
+            if task_id in updated
+            else TaskBulkItemResult(id=task_id, status="not_found")
+            for task_id in bulk_in.ids
+        ]
+    )
+
+
+@router.delete(
+    "/bulk",
+    response_model=TaskBulkResult,
+    status_code=status.HTTP_200_OK,
+    summary="Delete tasks in bulk",
+    description=(
+        "Delete many tasks of the current user in a single transaction. "
+        "Ids that do not exist or belong to another user are reported as `not_found`."
+    ),
+    tags=["tasks"]
+)
+async def delete_tasks_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    bulk_in: TaskBulkDelete,
+    current_user: User = Depends(deps.get_current_principal)
+) -> TaskBulkResult:
+    """
+    Delete many tasks of the current user.
+    """
+    deleted = set(await crud.delete_tasks(db, ids=bulk_in.ids, owner_id=current_user.id))
+    return TaskBulkResult(
+        results=[
+            TaskBulkItemResult(id=task_id, status="deleted" if task_id in deleted else "not_found")
+            for task_id in bulk_in.ids
+        ]
     )
-    return tasks
 
 
 @router.put(
@@ -68,17 +481,18 @@ async def update_task(
     db: AsyncSession = Depends(deps.get_db),
     task_id: int,
     task_in: TaskUpdate,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: User = Depends(deps.get_current_principal),
 ) -> Task:
     """
     Update a task by ID for the current user.
     """
-    db_task = await crud.get_task(db, id=task_id)
-    if not db_task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if db_task.owner_id != current_user.id:
+    task = await crud.update_task(db, id=task_id, owner_id=current_user.id, task_in=task_in)
+    if task is None:
+        # Only the miss path pays for a second lookup, to tell 404 from 403.
+        owner_id = await crud.get_task_owner_id(db, id=task_id)
+        if owner_id is None:
+            raise HTTPException(status_code=404, detail="Task not found")
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    task = await crud.update_task(db=db, db_task=db_task, task_in=task_in)
     return task
 
 
@@ -87,17 +501,16 @@ async def delete_task(
     *,
     db: AsyncSession = Depends(deps.get_db),
     task_id: int,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: User = Depends(deps.get_current_principal),
 ) -> None:
     """
     Delete a task.
     """
-    db_task = await crud.get_task(db, id=task_id)
-    if not db_task:
+    if await crud.delete_task(db, id=task_id, owner_id=current_user.id):
+        return
+    owner_id = await crud.get_task_owner_id(db, id=task_id)
+    if owner_id is None:
         # Even if the task doesn't exist, we don't want to reveal that
         # to a potential attacker. So we can pretend it was deleted.
         return
-    if db_task.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-    await crud.delete_task(db=db, db_task=db_task)
-    return
+    raise HTTPException(status_code=403, detail="Not enough permissions")
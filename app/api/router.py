@@ -1,8 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from app.api import deps
 
 from app.api.endpoints import auth, users, tasks
 
 api_router = APIRouter()
-api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
+api_router.include_router(auth.router, prefix="/auth", tags=["auth"], dependencies=[Depends(deps.rate_limit_by_ip)])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
-api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
+api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"], dependencies=[Depends(deps.rate_limit_by_user)])
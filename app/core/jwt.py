@@ -12,8 +12,11 @@ def create_token(data: dict, expires_delta: timedelta):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def create_access_token(user_id: int):
-    return create_token({"sub": str(user_id)}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+def create_access_token(user_id: int, email: str | None = None):
+    data = {"sub": str(user_id)}
+    if email is not None:
+        data["email"] = email
+    return create_token(data, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
 
 def create_refresh_token(user_id: int):
     return create_token({"sub": str(user_id)}, timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
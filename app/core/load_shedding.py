@@ -0,0 +1,45 @@
+from typing import Callable, Iterable
+
+from app.core import metrics
+
+# Paths that are always served: the liveness check and metrics scrapes should
+# keep answering precisely when the worker is overloaded.
+EXEMPT_PATHS = ("/", "/metrics")
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware answering 503 with Retry-After, before any routing or
+    database work, while `is_overloaded()` is true. Requests already admitted
+    are left to finish.
+    """
+
+    def __init__(
+        self,
+        app,
+        is_overloaded: Callable[[], bool],
+        retry_after: int = 1,
+        exempt_paths: Iterable[str] = EXEMPT_PATHS,
+    ):
+        self.app = app
+        self.is_overloaded = is_overloaded
+        self.retry_after = str(retry_after).encode()
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths or not self.is_overloaded():
+            await self.app(scope, receive, send)
+            return
+
+        metrics.SHED_REQUESTS.inc()
+        body = b'{"detail":"Server overloaded, retry later"}'
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", self.retry_after),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,195 @@
+import atexit
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Hashable, Optional
+
+import orjson
+
+from app.core import config
+
+# Logging for the long-running processes: the calling thread only filters,
+# formats the message and enqueues the record; a listener thread does the
+# blocking write to stderr.
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+# Pass as `extra` for records that are output rather than diagnostics, such
+# as delivered reminders: they are never sampled or dropped.
+UNSAMPLED = {"unsampled": True}
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+# and becomes a field of the JSON line.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "unsampled"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str, option=orjson.OPT_UTC_Z).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets each message template (logger and unformatted message) through
+    `burst` times per `window` seconds, then keeps one record in `rate`.
+    The next kept record carries the number skipped before it as `sampled`.
+    Records at ERROR and above, and those logged with UNSAMPLED, always pass.
+    """
+
+    def __init__(self, *, burst: int, window: float, rate: int):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.rate = max(1, rate)
+        # template -> [window start, records seen in it, skipped since last kept]
+        self._templates: Dict[Hashable, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR or getattr(record, "unsampled", False):
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        state = self._templates.get(key)
+        if state is None or now - state[0] >= self.window:
+            skipped = state[2] if state is not None else 0
+            state = self._templates[key] = [now, 0, skipped]
+            if len(self._templates) > 10_000:
+                self._templates.clear()
+                self._templates[key] = state
+        state[1] += 1
+        if state[1] > self.burst and (state[1] - self.burst) % self.rate:
+            state[2] += 1
+            return False
+        if state[2]:
+            record.sampled = state[2]
+            state[2] = 0
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    A QueueHandler that drops records, counting them, when its bounded queue
+    is full. Records logged with UNSAMPLED wait for room instead.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if getattr(record, "unsampled", False):
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback here, while the arguments are
+        # still valid, but leave the formatting to the listener thread.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class DrainingQueueListener(QueueListener):
+    """A QueueListener whose stop() waits for room rather than failing on a full queue."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+
+
+def _route_sql_echo_through_root() -> None:
+    # With DB_ECHO, SQLAlchemy gives its logger a blocking stdout handler
+    # unless it already has one; a NullHandler keeps echo on the queue.
+    sql_logger = logging.getLogger("sqlalchemy.engine.Engine")
+    sql_logger.handlers[:] = [logging.NullHandler()]
+    sql_logger.propagate = True
+
+
+def create_queue_handler() -> DroppingQueueHandler:
+    """
+    Starts the listener thread writing to stderr in LOG_FORMAT and returns
+    the handler that feeds it, with sampling applied before enqueueing.
+    """
+    global _listener, _handler
+    stop_logging()
+    log_queue: queue.Queue = queue.Queue(config.LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if config.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    _listener = DrainingQueueListener(log_queue, output)
+    _listener.start()
+    _handler = DroppingQueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(
+        burst=config.LOG_SAMPLE_BURST,
+        window=config.LOG_SAMPLE_WINDOW_SECONDS,
+        rate=config.LOG_SAMPLE_RATE,
+    ))
+    _route_sql_echo_through_root()
+    return _handler
+
+
+def configure_logging(level: str = config.LOG_LEVEL) -> None:
+    """Sends every log record of this process through the queue. For entrypoints only."""
+    root = logging.getLogger()
+    root.handlers[:] = [create_queue_handler()]
+    root.setLevel(level)
+
+
+def uvicorn_log_config(level: str = config.LOG_LEVEL) -> dict:
+    """
+    logging.config.dictConfig settings for uvicorn, which applies them in
+    every worker process before importing the app: uvicorn's own loggers,
+    access log included, propagate to the queue on the root logger.
+    """
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {"queue": {"()": "app.core.logs.create_queue_handler"}},
+        "root": {"level": level, "handlers": ["queue"]},
+        "loggers": {
+            name: {"level": level, "handlers": [], "propagate": True}
+            for name in ("uvicorn", "uvicorn.error", "uvicorn.access")
+        },
+    }
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+def stop_logging() -> None:
+    """Writes out what is still queued and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,205 @@
+import bisect
+import logging
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+# Request latency and query metrics in the Prometheus text format, kept
+# in-process per worker. Only installed when METRICS_ENABLED is on.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """A Prometheus histogram with one series per label set."""
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+class Counter:
+    """A Prometheus counter with one series per label set."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._series: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(key)} {_number(value)}" for key, value in self._series.items())
+        return lines
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route, method and status.", LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries issued per request, by route.", QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds", "Time spent in database queries per request, by route.", LATENCY_BUCKETS
+)
+SUSPECTED_N_PLUS_ONE = Counter(
+    "http_requests_n_plus_one_total",
+    "Requests issuing more than METRICS_N_PLUS_ONE_THRESHOLD queries, by route.",
+)
+RATE_LIMITED = Counter("http_requests_rate_limited_total", "Requests answered 429 by the rate limiter, by scope.")
+SHED_REQUESTS = Counter("http_requests_shed_total", "Requests answered 503 by load shedding.")
+DB_QUERIES = Counter("db_queries_total", "Database queries executed by this worker.")
+DB_QUERY_TIME = Counter("db_query_duration_seconds_total", "Time spent in database queries by this worker.")
+
+_METRICS = [
+    REQUEST_LATENCY,
+    REQUEST_QUERIES,
+    REQUEST_DB_TIME,
+    SUSPECTED_N_PLUS_ONE,
+    RATE_LIMITED,
+    SHED_REQUESTS,
+    DB_QUERIES,
+    DB_QUERY_TIME,
+]
+
+# Point-in-time values sampled on every scrape, e.g. pool gauges.
+_gauge_sources: List[Callable[[], Dict[str, float]]] = []
+
+
+class RequestStats:
+    """Query count and time of the request being handled."""
+
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def record_query(statement: str, seconds: float) -> None:
+    """Called by the engine hooks in app/db/session.py after every query."""
+    DB_QUERIES.inc()
+    DB_QUERY_TIME.inc(seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def add_gauges(source: Callable[[], Dict[str, float]]) -> None:
+    """Registers a callable returning {metric name: value}, sampled at scrape time."""
+    _gauge_sources.append(source)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for source in _gauge_sources:
+        for name, value in source().items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    for metric in _METRICS:
+        metric._series.clear()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request until its response is fully
+    sent (streaming bodies included) and collecting its query statistics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            # The matched route template, so ids in paths do not become labels.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.observe(elapsed, method=scope["method"], route=route, status=status)
+            REQUEST_QUERIES.observe(stats.queries, route=route)
+            REQUEST_DB_TIME.observe(stats.db_seconds, route=route)
+            if stats.queries > config.METRICS_N_PLUS_ONE_THRESHOLD:
+                SUSPECTED_N_PLUS_ONE.inc(route=route)
+                statement, repeats = max(stats.statements.items(), key=lambda item: item[1])
+                logger.warning(
+                    "Possible N+1 on %s %s: %d queries, the most repeated (%dx): %s",
+                    scope["method"], route, stats.queries, repeats, statement[:200],
+                )
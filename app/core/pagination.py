@@ -0,0 +1,42 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000
+
+class Cursor(NamedTuple):
+    """Keyset position: the sort key of the last row on a page."""
+    id: int
+    sort: str = "id"
+    due_date: Optional[datetime] = None
+
+def encode_cursor(cursor: Cursor) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor."""
+    if cursor.sort == "id":
+        raw = f"id:{cursor.id}"
+    else:
+        due = cursor.due_date.isoformat() if cursor.due_date is not None else ""
+        raw = f"{cursor.sort}:{cursor.id}:{due}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Decode a cursor produced by `encode_cursor`. Raises ValueError if invalid."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    sort, _, rest = raw.partition(":")
+    if sort == "id" and rest.isdigit():
+        return Cursor(id=int(rest))
+    if sort == "due_date":
+        value, _, due = rest.partition(":")
+        if value.isdigit():
+            return Cursor(
+                id=int(value),
+                sort=sort,
+                due_date=datetime.fromisoformat(due) if due else None,
+            )
+    raise ValueError("Invalid cursor")
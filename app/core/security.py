@@ -1,9 +1,49 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
+from app.core import config
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL while hashing, so a small thread pool keeps the
+# event loop free. The semaphore caps how many hashes run at once; callers
+# beyond the cap wait on it and are counted in the queue depth.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=config.PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash"
+)
+_hash_slots = asyncio.Semaphore(config.PASSWORD_HASH_CONCURRENCY)
+_queued = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+async def _run_in_hash_pool(func, *args):
+    global _queued
+    _queued += 1
+    queued = True
+    try:
+        async with _hash_slots:
+            _queued -= 1
+            queued = False
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        if queued:
+            _queued -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """`verify_password` run in the password hashing pool."""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """`get_password_hash` run in the password hashing pool."""
+    return await _run_in_hash_pool(get_password_hash, password)
+
+def password_hash_queue_depth() -> int:
+    """Number of hash/verify calls waiting for a free slot."""
+    return _queued
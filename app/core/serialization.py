@@ -0,0 +1,17 @@
+from typing import Iterable, Mapping
+
+import orjson
+
+# orjson writes UTC datetimes with a "Z" suffix, matching Pydantic's output.
+_OPTIONS = orjson.OPT_UTC_Z
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj, option=_OPTIONS)
+
+def dumps_rows(rows: Iterable[Mapping]) -> bytes:
+    """Serializes column mappings (e.g. `result.mappings()`) as a JSON array."""
+    return orjson.dumps([dict(row) for row in rows], option=_OPTIONS)
+
+def dumps_rows_ndjson(rows: Iterable[Mapping]) -> bytes:
+    """Serializes column mappings as newline-delimited JSON."""
+    return b"".join(orjson.dumps(dict(row), option=_OPTIONS) + b"\n" for row in rows)
@@ -1,14 +1,31 @@
+from __future__ import annotations
+
+import hashlib
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from sqlalchemy import Integer, any_, bindparam, delete, false, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.engine import Row, RowMapping
+from sqlalchemy.orm import joinedload
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime, timezone
 
 from app.models.user import User
-from app.models.task import Task
-from app.schemas.user import UserCreate
-from app.schemas.task import TaskCreate, TaskUpdate
-from app.core.security import get_password_hash
+from app.models.task import SEARCH_CONFIG, Task
+from app.models.task_archive import ArchivedTask
+from app.core.pagination import Cursor
+from app.core import config
+from app.db import listing_cache, reminder_schedule, task_events, task_stats
+
+# The workers use this module without the API's schemas, Pydantic and
+# passlib; those are only imported where they are needed at runtime.
+if TYPE_CHECKING:
+    from app.schemas.user import UserCreate
+    from app.schemas.task import TaskCreate, TaskFilter, TaskUpdate
+
+# Columns returned by the row-based task queries (everything the API exposes;
+# the generated search vector stays in the database).
+TASK_COLUMNS = (Task.id, Task.title, Task.description, Task.due_date, Task.is_completed, Task.owner_id)
 
 async def get_user_by_email(db: AsyncSession, *, email: str) -> User | None:
     result = await db.execute(select(User).filter(User.email == email))
@@ -20,9 +37,11 @@ async def get_user_by_id(db: AsyncSession, *, user_id: int) -> User | None:
 
 
 async def create_user(db: AsyncSession, *, user_in: UserCreate) -> User:
+    from app.core.security import get_password_hash_async
+
     db_user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await get_password_hash_async(user_in.password),
     )
     db.add(db_user)
     await db.commit()
@@ -35,39 +54,489 @@ async def create_task(db: AsyncSession, *, task_in: TaskCreate, owner_id: int) -
     db.add(db_task)
     await db.commit()
     await db.refresh(db_task)
+    await _after_task_write(
+        owner_id, saved=[db_task], event="created", transitions=[(None, bool(db_task.is_completed))]
+    )
     return db_task
 
 
+def _request_hash(task_in: TaskCreate) -> str:
+    return hashlib.sha256(task_in.model_dump_json().encode()).hexdigest()
+
+
+async def _get_task_by_idempotency_key(db: AsyncSession, *, owner_id: int, key: str) -> Optional[Row]:
+    result = await db.execute(
+        select(*TASK_COLUMNS, Task.idempotency_request_hash)
+        .where(Task.owner_id == owner_id, Task.idempotency_key == key)
+    )
+    return result.first()
+
+
+async def create_task_once(
+    db: AsyncSession, *, task_in: TaskCreate, owner_id: int, idempotency_key: str
+) -> Tuple[Row, bool]:
+    """
+    Creates the task unless the owner already created one with this
+    idempotency key, in which case that task is returned without another
+    insert. Returns (task row, whether it was created now). Raises
+    ValueError if the key was first used with a different request body.
+
+    A concurrent request with the same key blocks on the unique index until
+    the first one commits, skips its insert and returns the first task.
+    """
+    request_hash = _request_hash(task_in)
+    while True:
+        row = await _get_task_by_idempotency_key(db, owner_id=owner_id, key=idempotency_key)
+        if row is not None:
+            # Tasks created before request hashes were stored cannot be checked.
+            if row.idempotency_request_hash not in (None, request_hash):
+                raise ValueError("Idempotency-Key was already used for a different request")
+            return row, False
+        stmt = (
+            pg_insert(Task)
+            .values(
+                **task_in.dict(),
+                owner_id=owner_id,
+                is_completed=False,
+                idempotency_key=idempotency_key,
+                idempotency_request_hash=request_hash,
+            )
+            .on_conflict_do_nothing(
+                index_elements=[Task.owner_id, Task.idempotency_key],
+                index_where=Task.idempotency_key.is_not(None),
+            )
+            .returning(*TASK_COLUMNS)
+        )
+        row = (await db.execute(stmt)).first()
+        await db.commit()
+        if row is not None:
+            await _after_task_write(
+                owner_id, saved=[row], event="created", transitions=[(None, False)]
+            )
+            return row, True
+        # Lost the race to a concurrent request; its task is committed now.
+
+
+async def _after_task_write(
+    owner_id: int,
+    *,
+    saved: Iterable = (),
+    event: str = "updated",
+    deleted_ids: Iterable[int] = (),
+    deleted_event: str = "deleted",
+    transitions: Iterable[task_stats.Transition] = (),
+) -> None:
+    """
+    Propagates a committed task write to the reminder schedule, the stats
+    counters, the listing cache and the change feed, where the `saved` tasks
+    are reported as `event` and the removed ones as `deleted_event`. Each of
+    them logs rather than raises on a Redis failure, so the write itself
+    always stands.
+    """
+    saved, deleted_ids = list(saved), list(deleted_ids)
+    if saved:
+        await reminder_schedule.sync_tasks(saved)
+    if deleted_ids:
+        await reminder_schedule.unschedule_tasks(deleted_ids)
+    await task_stats.record(owner_id, transitions=transitions, saved=saved, deleted_ids=deleted_ids)
+    await listing_cache.bump_version(owner_id)
+    await task_events.publish(
+        owner_id,
+        [task_events.task_event(event, task) for task in saved]
+        + [task_events.deleted_event(task_id, deleted_event) for task_id in deleted_ids],
+    )
+
+
+def _update_event(values: Dict[str, Any]) -> str:
+    return "completed" if values.get("is_completed") else "updated"
+
+
+def _with_completed_at(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Stamps completed_at when a task is completed, keeping the first stamp on repeats."""
+    if "is_completed" not in values:
+        return values
+    completed_at = func.coalesce(Task.completed_at, func.now()) if values["is_completed"] else None
+    return {**values, "completed_at": completed_at}
+
+
+def _update_tasks_stmt(where, values: Dict[str, Any]):
+    """
+    UPDATE ... RETURNING the task columns. When the stats counters need the
+    completion transition, the rows are locked and their previous status is
+    returned as well, as `was_completed`.
+    """
+    if not (config.TASK_STATS_COUNTERS and "is_completed" in values):
+        return update(Task).where(*where).values(**values).returning(*TASK_COLUMNS)
+    previous = (
+        select(Task.id, Task.is_completed.label("was_completed"))
+        .where(*where)
+        .with_for_update()
+        .subquery()
+    )
+    return (
+        update(Task)
+        .where(Task.id == previous.c.id)
+        .values(**values)
+        .returning(*TASK_COLUMNS, previous.c.was_completed)
+    )
+
+
+def _update_transitions(rows: List[Row]) -> List[task_stats.Transition]:
+    return [
+        (bool(row.was_completed), bool(row.is_completed))
+        for row in rows
+        if "was_completed" in row._fields
+    ]
+
+
+def _tasks_query(
+    *,
+    owner_id: int,
+    filters: Optional[TaskFilter] = None,
+    after: Optional[Cursor] = None,
+    columns_only: bool = False,
+):
+    """
+    The owner's tasks with `filters` applied in SQL, in keyset order for
+    `filters.sort`, starting after the `after` cursor.
+    """
+    if filters is None:
+        from app.schemas.task import TaskFilter
+        filters = TaskFilter()
+    query = select(*TASK_COLUMNS) if columns_only else select(Task)
+    query = query.filter(Task.owner_id == owner_id)
+    if filters.is_completed is not None:
+        query = query.filter(Task.is_completed == filters.is_completed)
+    if filters.due_after is not None:
+        query = query.filter(Task.due_date >= filters.due_after)
+    if filters.due_before is not None:
+        query = query.filter(Task.due_date < filters.due_before)
+    if filters.overdue:
+        query = query.filter(Task.is_completed == False, Task.due_date < func.now())
+    if filters.q:
+        query = query.filter(
+            Task.search_vector.op("@@")(func.websearch_to_tsquery(SEARCH_CONFIG, filters.q))
+        )
+
+    if filters.sort == "due_date":
+        # Ascending due dates sort NULLs last, so tasks without a due date
+        # come after every dated task.
+        if after is not None:
+            if after.due_date is None:
+                query = query.filter(Task.due_date.is_(None), Task.id > after.id)
+            else:
+                query = query.filter(
+                    or_(
+                        tuple_(Task.due_date, Task.id) > tuple_(after.due_date, after.id),
+                        Task.due_date.is_(None),
+                    )
+                )
+        return query.order_by(Task.due_date.asc().nulls_last(), Task.id)
+
+    if after is not None:
+        query = query.filter(Task.id > after.id)
+    return query.order_by(Task.id)
+
+
 async def get_tasks(
-    db: AsyncSession, *, owner_id: int, is_completed: Optional[bool] = None
+    db: AsyncSession,
+    *,
+    owner_id: int,
+    filters: Optional[TaskFilter] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
 ) -> List[Task]:
-    query = select(Task).filter(Task.owner_id == owner_id)
-    if is_completed is not None:
-        query = query.filter(Task.is_completed == is_completed)
-    result = await db.execute(query.order_by(Task.id))
+    """
+    Returns the owner's tasks matching `filters`, starting after the `after`
+    cursor (keyset pagination) and capped at `limit` rows when given.
+    """
+    query = _tasks_query(owner_id=owner_id, filters=filters, after=after)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
     return result.scalars().all()
 
 
+async def stream_tasks(
+    db: AsyncSession,
+    *,
+    owner_id: int,
+    filters: Optional[TaskFilter] = None,
+    after: Optional[Cursor] = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[List[Task]]:
+    """
+    Yields the owner's tasks in chunks of `chunk_size` from a server-side
+    cursor, so memory use does not grow with the number of tasks.
+    """
+    query = _tasks_query(owner_id=owner_id, filters=filters, after=after)
+    result = await db.stream(query.execution_options(yield_per=chunk_size))
+    async for partition in result.scalars().partitions():
+        yield partition
+        db.expunge_all()
+
+
+async def get_task_rows(
+    db: AsyncSession,
+    *,
+    owner_id: int,
+    filters: Optional[TaskFilter] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[RowMapping]:
+    """
+    Same as `get_tasks`, but selects plain columns and returns mappings, so
+    no ORM objects are built. Used by the fast JSON path.
+    """
+    query = _tasks_query(owner_id=owner_id, filters=filters, after=after, columns_only=True)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.mappings().all()
+
+
+async def stream_task_rows(
+    db: AsyncSession,
+    *,
+    owner_id: int,
+    filters: Optional[TaskFilter] = None,
+    after: Optional[Cursor] = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[List[RowMapping]]:
+    """Same as `stream_tasks`, but yields chunks of column mappings."""
+    query = _tasks_query(owner_id=owner_id, filters=filters, after=after, columns_only=True)
+    result = await db.stream(query.execution_options(yield_per=chunk_size))
+    async for partition in result.mappings().partitions():
+        yield partition
+
+
 async def get_task(db: AsyncSession, *, id: int) -> Optional[Task]:
     result = await db.execute(select(Task).filter(Task.id == id))
     return result.scalars().first()
 
 
+async def get_task_owner_id(db: AsyncSession, *, id: int) -> Optional[int]:
+    result = await db.execute(select(Task.owner_id).filter(Task.id == id))
+    return result.scalars().first()
+
+
 async def update_task(
-    db: AsyncSession, *, db_task: Task, task_in: TaskUpdate
-) -> Task:
+    db: AsyncSession, *, id: int, owner_id: int, task_in: TaskUpdate
+) -> Optional[Row]:
+    """
+    Updates the task in a single owner-scoped UPDATE ... RETURNING. Returns
+    None when no task with that id belongs to the owner.
+    """
     update_data = task_in.dict(exclude_unset=True)
-    for field in update_data:
-        setattr(db_task, field, update_data[field])
-    db.add(db_task)
+    if not update_data:
+        result = await db.execute(
+            select(*TASK_COLUMNS).where(Task.id == id, Task.owner_id == owner_id)
+        )
+        return result.first()
+    stmt = _update_tasks_stmt(
+        (Task.id == id, Task.owner_id == owner_id), _with_completed_at(update_data)
+    ).execution_options(synchronize_session=False)
+    result = await db.execute(stmt)
+    row = result.first()
     await db.commit()
-    await db.refresh(db_task)
-    return db_task
+    if row is not None:
+        await _after_task_write(
+            owner_id,
+            saved=[row],
+            event=_update_event(update_data),
+            transitions=_update_transitions([row]),
+        )
+    return row
+
+
+async def delete_task(db: AsyncSession, *, id: int, owner_id: int) -> bool:
+    """
+    Deletes the task in a single owner-scoped DELETE ... RETURNING. Returns
+    False when no task with that id belongs to the owner.
+    """
+    stmt = (
+        delete(Task)
+        .where(Task.id == id, Task.owner_id == owner_id)
+        .returning(Task.id, Task.is_completed)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    row = result.first()
+    await db.commit()
+    if row is None:
+        return False
+    await _after_task_write(
+        owner_id, deleted_ids=[id], transitions=[(bool(row.is_completed), None)]
+    )
+    return True
+
+
+def _task_id_in(ids: List[int]):
+    # One array parameter rather than one bind per id, so the statement
+    # text (and its prepared plan) is the same for every batch size.
+    return Task.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
 
 
-async def delete_task(db: AsyncSession, *, db_task: Task) -> None:
-    await db.delete(db_task)
+def _owned_task_ids(ids: List[int], owner_id: int):
+    return (_task_id_in(ids), Task.owner_id == owner_id)
+
+
+async def create_tasks(
+    db: AsyncSession, *, tasks_in: List[TaskCreate], owner_id: int
+) -> List[Row]:
+    """
+    Inserts all tasks with a single multi-row INSERT ... RETURNING and
+    returns the rows in input order.
+    """
+    stmt = insert(Task).returning(*TASK_COLUMNS, sort_by_parameter_order=True)
+    result = await db.execute(
+        stmt,
+        [{**task_in.dict(), "owner_id": owner_id, "is_completed": False} for task_in in tasks_in],
+    )
+    rows = result.all()
     await db.commit()
+    if rows:
+        await _after_task_write(
+            owner_id,
+            saved=rows,
+            event="created",
+            transitions=[(None, bool(row.is_completed)) for row in rows],
+        )
+    return rows
+
+
+async def update_tasks(
+    db: AsyncSession, *, ids: List[int], owner_id: int, task_in: TaskUpdate
+) -> List[Row]:
+    """
+    Applies the same changes to every listed task the owner has, in one
+    UPDATE ... RETURNING. Ids that are missing or owned by someone else are
+    simply absent from the result.
+    """
+    update_data = task_in.dict(exclude_unset=True)
+    stmt = _update_tasks_stmt(
+        _owned_task_ids(ids, owner_id), _with_completed_at(update_data)
+    ).execution_options(synchronize_session=False)
+    result = await db.execute(stmt)
+    rows = result.all()
+    await db.commit()
+    if rows:
+        await _after_task_write(
+            owner_id,
+            saved=rows,
+            event=_update_event(update_data),
+            transitions=_update_transitions(rows),
+        )
+    return rows
+
+
+async def delete_tasks(db: AsyncSession, *, ids: List[int], owner_id: int) -> List[int]:
+    """
+    Deletes every listed task the owner has in one DELETE ... RETURNING and
+    returns the ids that were deleted.
+    """
+    stmt = (
+        delete(Task)
+        .where(*_owned_task_ids(ids, owner_id))
+        .returning(Task.id, Task.is_completed)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    rows = result.all()
+    await db.commit()
+    deleted = [row.id for row in rows]
+    if deleted:
+        await _after_task_write(
+            owner_id,
+            deleted_ids=deleted,
+            transitions=[(bool(row.is_completed), None) for row in rows],
+        )
+    return deleted
+
+
+async def get_task_stats(
+    db: AsyncSession, *, owner_id: int, bucket: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Open, completed and overdue counts of the owner's tasks and, when
+    `bucket` is "day" or "week", a histogram of due dates in UTC, all from
+    one grouped query. Tasks without a due date are left out of the histogram.
+    """
+    completed = func.coalesce(Task.is_completed, false())
+    columns = [
+        completed.label("completed"),
+        func.count().label("total"),
+        func.count().filter(~completed, Task.due_date < func.now()).label("overdue"),
+    ]
+    group_by = [completed]
+    if bucket is not None:
+        start = func.date_trunc(bucket, func.timezone("UTC", Task.due_date))
+        columns.insert(0, start.label("start"))
+        group_by.insert(0, start)
+    query = select(*columns).filter(Task.owner_id == owner_id).group_by(*group_by)
+    result = await db.execute(query)
+
+    stats = {"open": 0, "completed": 0, "overdue": 0, "bucket": bucket, "histogram": []}
+    histogram: Dict[datetime, Dict[str, Any]] = {}
+    for row in result:
+        status = "completed" if row.completed else "open"
+        stats[status] += row.total
+        stats["overdue"] += row.overdue
+        if bucket is not None and row.start is not None:
+            entry = histogram.setdefault(
+                row.start, {"start": row.start.date(), "open": 0, "completed": 0}
+            )
+            entry[status] += row.total
+    stats["total"] = stats["open"] + stats["completed"]
+    stats["histogram"] = [histogram[start] for start in sorted(histogram)]
+    return stats
+
+
+async def get_open_task_due_dates(db: AsyncSession, *, owner_id: int) -> Dict[int, datetime]:
+    """Due dates of the owner's open tasks that have one, by task id."""
+    result = await db.execute(
+        select(Task.id, Task.due_date).filter(
+            Task.owner_id == owner_id, Task.is_completed == False, Task.due_date.is_not(None)
+        )
+    )
+    return {row.id: row.due_date for row in result}
+
+
+async def get_tasks_by_ids(db: AsyncSession, *, ids: List[int]) -> List[Task]:
+    result = await db.execute(select(Task).filter(_task_id_in(ids)))
+    return result.scalars().all()
+
+
+async def get_reminder_rows(db: AsyncSession, *, ids: List[int]) -> List[Row]:
+    """
+    The listed tasks that are still open, with their owner's email, in one
+    joined query: (id, title, due_date, owner_id, email), by owner.
+    """
+    result = await db.execute(
+        select(Task.id, Task.title, Task.due_date, Task.owner_id, User.email)
+        .join(User, User.id == Task.owner_id)
+        .filter(_task_id_in(ids), Task.is_completed == False)
+        .order_by(Task.owner_id, Task.due_date)
+    )
+    return result.all()
+
+
+async def stream_open_task_due_dates(
+    db: AsyncSession, *, chunk_size: int = 1000
+) -> AsyncIterator[List[Row]]:
+    """
+    Yields (id, due_date, is_completed) rows of every open task with a due
+    date, in chunks from a server-side cursor over the open-due-date index.
+    """
+    query = (
+        select(Task.id, Task.due_date, Task.is_completed)
+        .filter(Task.is_completed == False, Task.due_date.is_not(None))
+        .order_by(Task.due_date)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield partition
 
 
 async def get_overdue_tasks(db: AsyncSession) -> List[Task]:
@@ -77,8 +546,67 @@ async def get_overdue_tasks(db: AsyncSession) -> List[Task]:
     now = datetime.now(timezone.utc)
     query = (
         select(Task)
-        .options(selectinload(Task.owner))
+        .options(joinedload(Task.owner))
         .filter(Task.is_completed == False, Task.due_date < now)
     )
     result = await db.execute(query)
     return result.scalars().all()
+
+
+ARCHIVED_COLUMNS = ("id", "title", "description", "due_date", "owner_id", "completed_at")
+
+
+async def archive_completed_tasks(
+    db: AsyncSession, *, completed_before: datetime, batch_size: int
+) -> List[Row]:
+    """
+    Moves up to `batch_size` tasks completed before `completed_before` from
+    tasks to task_archive in one statement, DELETE ... RETURNING feeding an
+    INSERT, and commits. Rows locked by a concurrent write are skipped and
+    picked up by a later batch. Returns the (id, owner_id) of the moved tasks.
+    """
+    candidates = (
+        select(Task.id)
+        .where(Task.is_completed == True, Task.completed_at < completed_before)
+        .order_by(Task.completed_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    moved = (
+        delete(Task)
+        .where(Task.id.in_(candidates.scalar_subquery()))
+        .returning(*(getattr(Task, name) for name in ARCHIVED_COLUMNS))
+        .cte("moved")
+    )
+    stmt = (
+        insert(ArchivedTask)
+        .from_select(ARCHIVED_COLUMNS, select(*(moved.c[name] for name in ARCHIVED_COLUMNS)))
+        .returning(ArchivedTask.id, ArchivedTask.owner_id)
+        .add_cte(moved)
+    )
+    result = await db.execute(stmt)
+    rows = result.all()
+    await db.commit()
+
+    moved_by_owner: Dict[int, List[int]] = {}
+    for row in rows:
+        moved_by_owner.setdefault(row.owner_id, []).append(row.id)
+    for owner_id, task_ids in moved_by_owner.items():
+        await _after_task_write(
+            owner_id,
+            deleted_ids=task_ids,
+            deleted_event="archived",
+            transitions=[(True, None)] * len(task_ids),
+        )
+    return rows
+
+
+async def get_archived_tasks(
+    db: AsyncSession, *, owner_id: int, after: Optional[Cursor] = None, limit: int
+) -> List[ArchivedTask]:
+    """The owner's archived tasks in id order, starting after the `after` cursor."""
+    query = select(ArchivedTask).filter(ArchivedTask.owner_id == owner_id)
+    if after is not None:
+        query = query.filter(ArchivedTask.id > after.id)
+    result = await db.execute(query.order_by(ArchivedTask.id).limit(limit))
+    return result.scalars().all()
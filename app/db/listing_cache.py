@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import uuid
+from typing import Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Per-owner listing version. It is replaced with a fresh random token on every
+# task write, so a version can never repeat even if Redis loses the key.
+VERSION_KEY_PREFIX = "tasks_listing_version:"
+BODY_KEY_PREFIX = "tasks_listing_body:"
+# Bounds how long a lost version bump could keep serving a stale listing:
+# no longer than a cached body lives anyway.
+VERSION_TTL_SECONDS = max(1, int(config.LISTING_CACHE_TTL_SECONDS))
+
+_local_bodies = TTLCache(
+    maxsize=config.LISTING_CACHE_MAX_ENTRIES, ttl=config.LISTING_CACHE_TTL_SECONDS
+)
+
+def _version_key(owner_id: int) -> str:
+    return f"{VERSION_KEY_PREFIX}{owner_id}"
+
+async def get_version(owner_id: int, client=redis_client) -> Optional[str]:
+    """
+    Current listing version for the owner, created on first use. Returns
+    None when Redis is unavailable, in which case nothing may be cached.
+    """
+    key = _version_key(owner_id)
+    try:
+        version = await client.get(key)
+        if version is None:
+            await client.set(key, uuid.uuid4().hex, nx=True, ex=VERSION_TTL_SECONDS)
+            version = await client.get(key)
+        return version
+    except RedisError:
+        logger.warning("Could not read the task listing version", exc_info=True)
+        return None
+
+async def bump_version(owner_id: int, client=redis_client) -> None:
+    """
+    Invalidates every cached listing and ETag of the owner. If the new
+    version cannot be written, the old one is deleted instead, so the next
+    read starts a fresh version; only when that fails too can a stale
+    listing be served, for at most VERSION_TTL_SECONDS.
+    """
+    key = _version_key(owner_id)
+    try:
+        await client.set(key, uuid.uuid4().hex, ex=VERSION_TTL_SECONDS)
+        return
+    except RedisError:
+        logger.warning("Could not bump the task listing version", exc_info=True)
+    try:
+        await client.delete(key)
+    except RedisError:
+        logger.error(
+            "Could not invalidate the task listing version; listings of user %d may be stale for up to %ds",
+            owner_id, VERSION_TTL_SECONDS, exc_info=True,
+        )
+
+def make_etag(version: str, *params) -> str:
+    digest = hashlib.sha1(repr((version, params)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def _body_key(owner_id: int, etag: str) -> str:
+    return f"{BODY_KEY_PREFIX}{owner_id}:{etag}"
+
+async def get_body(owner_id: int, etag: str, client=redis_client) -> Optional[Tuple[str, Optional[str]]]:
+    """Cached (body, next cursor) of a listing, keyed by its ETag."""
+    backend = config.LISTING_CACHE_BACKEND
+    if backend == "memory":
+        return _local_bodies.get((owner_id, etag))
+    if backend == "redis":
+        try:
+            raw = await client.get(_body_key(owner_id, etag))
+        except RedisError:
+            logger.warning("Could not read a cached task listing", exc_info=True)
+            return None
+        return tuple(json.loads(raw)) if raw is not None else None
+    return None
+
+async def set_body(
+    owner_id: int, etag: str, body: str, next_cursor: Optional[str], client=redis_client
+) -> None:
+    backend = config.LISTING_CACHE_BACKEND
+    if backend == "memory":
+        _local_bodies.set((owner_id, etag), (body, next_cursor))
+    elif backend == "redis":
+        try:
+            await client.set(
+                _body_key(owner_id, etag),
+                json.dumps([body, next_cursor]),
+                ex=max(1, int(config.LISTING_CACHE_TTL_SECONDS)),
+            )
+        except RedisError:
+            logger.warning("Could not cache a task listing", exc_info=True)
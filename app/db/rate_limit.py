@@ -0,0 +1,108 @@
+import logging
+import math
+import time
+from typing import List, NamedTuple
+
+from redis.exceptions import RedisError
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "rate_limit:"
+# After a Redis error, requests use the per-worker buckets for this long
+# before Redis is tried again, so an unreachable Redis does not add its
+# connect timeouts and retries to every limited request.
+REDIS_RETRY_SECONDS = 5.0
+
+
+class Limit(NamedTuple):
+    """A token bucket refilled with `per_minute` tokens a minute, holding at most `burst`."""
+
+    per_minute: float
+    burst: int
+
+    @property
+    def per_second(self) -> float:
+        return self.per_minute / 60
+
+
+# Refills the bucket for the time elapsed on the Redis clock, so every worker
+# agrees on it, then takes a token if one is available. Returns whether the
+# request is allowed and, if not, in how many milliseconds a token is due.
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local rate = tonumber(ARGV[1]) / 1000
+local burst = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now_ms
+tokens = math.min(burst, tokens + math.max(0, now_ms - ts) * rate)
+local allowed = 0
+local retry_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_ms = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now_ms)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1000)
+return {allowed, retry_ms}
+"""
+
+_token_bucket_script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+# Fallback buckets while Redis is unreachable: [tokens, monotonic time]. They
+# are per worker, so a client can get up to one budget per worker meanwhile.
+_local_buckets = TTLCache(maxsize=config.RATE_LIMIT_LOCAL_MAX_KEYS, ttl=3600.0)
+# Monotonic time until which Redis is skipped; 0 while it is reachable.
+_redis_retry_at = 0.0
+
+
+def _key(scope: str, identity: str) -> str:
+    return f"{KEY_PREFIX}{scope}:{identity}"
+
+
+def _hit_local(key: str, limit: Limit) -> float:
+    now = time.monotonic()
+    bucket: List[float] = _local_buckets.get(key) or [float(limit.burst), now]
+    tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.per_second)
+    retry_after = 0.0
+    if tokens >= 1:
+        tokens -= 1
+    else:
+        retry_after = (1 - tokens) / limit.per_second
+    _local_buckets.set(key, [tokens, now])
+    return retry_after
+
+
+async def hit(scope: str, identity: str, limit: Limit) -> float:
+    """
+    Takes a token from the `scope` bucket of `identity` (a user id, client IP
+    or account). Returns 0 if the request is allowed, otherwise the seconds
+    until it would be.
+    """
+    global _redis_retry_at
+    key = _key(scope, identity)
+    if time.monotonic() < _redis_retry_at:
+        return _hit_local(key, limit)
+    try:
+        allowed, retry_ms = await _token_bucket_script(keys=[key], args=[limit.per_second, limit.burst])
+    except RedisError:
+        if not _redis_retry_at:
+            logger.warning("Rate limiting falls back to per-worker buckets", exc_info=True)
+        _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+        return _hit_local(key, limit)
+    if _redis_retry_at:
+        logger.info("Rate limiting is shared through Redis again")
+        _redis_retry_at = 0.0
+    return 0.0 if allowed else retry_ms / 1000
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After takes whole seconds; round up so clients never retry early."""
+    return str(max(1, math.ceil(seconds)))
@@ -1,9 +1,85 @@
+from itertools import islice
+from typing import Any, Callable, Iterable, List, TypeVar
+
 import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialWithJitterBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+
+from app.core import config
+
+T = TypeVar("T")
+
+REDIS_URL = config.REDIS_URL
+
+def create_redis_client(url: str = REDIS_URL, **overrides) -> redis.Redis:
+    """
+    Builds a client from app.core.config: a blocking pool of at most
+    REDIS_MAX_CONNECTIONS connections (callers wait for a free one rather
+    than fail), socket and connect timeouts, and retries with jittered
+    exponential backoff on connection errors and timeouts. No connection is
+    opened until the first command. Keyword arguments override individual
+    pool options, e.g. max_connections for a worker.
+    """
+    options = dict(
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        timeout=config.REDIS_POOL_TIMEOUT,
+        socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+        retry=Retry(
+            ExponentialWithJitterBackoff(
+                cap=config.REDIS_RETRY_BACKOFF_CAP, base=config.REDIS_RETRY_BACKOFF_BASE
+            ),
+            config.REDIS_RETRIES,
+        ),
+        retry_on_error=[ConnectionError, TimeoutError],
+        decode_responses=True,
+    )
+    options.update(overrides)
+    pool = redis.BlockingConnectionPool.from_url(url, **options)
+    # from_pool hands the pool to the client, so aclose() disconnects it.
+    return redis.Redis.from_pool(pool)
+
+def pool_status(client: redis.Redis) -> dict:
+    """Point-in-time connection pool gauges."""
+    pool = client.connection_pool
+    in_use = len(pool._in_use_connections)
+    idle = len(pool._available_connections)
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": in_use,
+        "idle": idle,
+    }
+
+def batched(items: Iterable[T], size: int) -> Iterable[List[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
-# Connection details for the Redis service running in Docker
-REDIS_URL = "redis://localhost:6379"
+async def pipelined(
+    client: redis.Redis,
+    items: Iterable[T],
+    queue: Callable[[Any, T], None],
+    *,
+    batch_size: int = 1000,
+    transaction: bool = False,
+) -> List[Any]:
+    """
+    Calls `queue(pipe, item)` for every item and executes the queued
+    commands one round trip per `batch_size` items, so large inputs neither
+    cost a round trip each nor build one unbounded pipeline. Returns the
+    replies in order.
+    """
+    replies: List[Any] = []
+    for batch in batched(items, batch_size):
+        async with client.pipeline(transaction=transaction) as pipe:
+            for item in batch:
+                queue(pipe, item)
+            replies.extend(await pipe.execute())
+    return replies
 
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+redis_client = create_redis_client()
 
 async def get_redis_client():
     """Dependency to get a Redis client."""
@@ -0,0 +1,51 @@
+import logging
+from typing import Iterable
+
+from redis.exceptions import RedisError
+
+from app.db.redis import pipelined, redis_client
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of open tasks with a due date: member is the task id, score is
+# the due date as a Unix timestamp. Read by app/workers/reminder.py.
+SCHEDULE_KEY = "overdue_tasks_schedule"
+# Claimed reminders, scored by the time their lease runs out.
+PROCESSING_KEY = "overdue_tasks_processing"
+# Reminders whose delivery kept failing, scored by when they were given up on.
+DEAD_LETTER_KEY = "overdue_tasks_dead_letter"
+
+def _queue_sync(pipe, task) -> None:
+    if task.due_date is not None and not task.is_completed:
+        pipe.zadd(SCHEDULE_KEY, {str(task.id): task.due_date.timestamp()})
+    else:
+        pipe.zrem(SCHEDULE_KEY, str(task.id))
+        pipe.zrem(PROCESSING_KEY, str(task.id))
+
+async def sync_tasks(tasks: Iterable, client=redis_client) -> None:
+    """
+    Brings the schedule in line with the given tasks (anything with `id`,
+    `due_date` and `is_completed`), pipelined in batches of a thousand:
+    open tasks with a due date are upserted, everything else is removed.
+
+    Called after the database commit, so a Redis failure is logged rather
+    than failing the write; `python -m app.workers.schedule_backfill`
+    repairs any drift.
+    """
+    try:
+        await pipelined(client, tasks, _queue_sync)
+    except RedisError:
+        logger.warning("Could not update the reminder schedule", exc_info=True)
+
+async def unschedule_tasks(task_ids: Iterable[int], client=redis_client) -> None:
+    """Removes deleted tasks from the schedule."""
+    members = [str(task_id) for task_id in task_ids]
+    if not members:
+        return
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zrem(SCHEDULE_KEY, *members)
+            pipe.zrem(PROCESSING_KEY, *members)
+            await pipe.execute()
+    except RedisError:
+        logger.warning("Could not update the reminder schedule", exc_info=True)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core import config, serialization
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Every task write appends its events to the owner's stream, which keeps the
+# last TASK_EVENTS_RETENTION_SECONDS of history for clients resuming from a
+# Last-Event-ID, and publishes them on the owner's channel. Each API worker
+# holds one pattern subscription and fans events out to its local listeners.
+STREAM_KEY_PREFIX = "task_events:"
+CHANNEL_PREFIX = "task_events:"
+
+TASK_FIELDS = ("id", "title", "description", "due_date", "is_completed", "owner_id")
+
+# ARGV: retention in ms, channel, event payloads. Stream ids come from the
+# Redis clock, so trimming by MINID needs the same clock.
+PUBLISH_SCRIPT = """
+local now = redis.call('TIME')
+local min_id = string.format('%d', tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000) - tonumber(ARGV[1]))
+for i = 3, #ARGV do
+    local id = redis.call('XADD', KEYS[1], 'MINID', '~', min_id, '*', 'data', ARGV[i])
+    redis.call('PUBLISH', ARGV[2], id .. ' ' .. ARGV[i])
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Longest single read on the subscription connection. It stands in for the
+# pool's socket timeout, so a quiet channel is not taken for a dead connection.
+SUBSCRIPTION_POLL_SECONDS = 1.0
+
+_EVENT_ID = re.compile(r"^\d+-\d+$")
+
+_publish_script = redis_client.register_script(PUBLISH_SCRIPT)
+
+def _stream_key(owner_id: int) -> str:
+    return f"{STREAM_KEY_PREFIX}{owner_id}"
+
+def _channel(owner_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{owner_id}"
+
+def parse_event_id(event_id: str) -> Tuple[int, int]:
+    """Orderable form of a stream id. Raises ValueError if invalid."""
+    if not _EVENT_ID.match(event_id):
+        raise ValueError("Invalid event id")
+    ms, seq = event_id.split("-")
+    return int(ms), int(seq)
+
+def task_event(type: str, task) -> str:
+    """Event for a created, updated or completed task (anything with the task fields)."""
+    return serialization.dumps(
+        {"type": type, "task": {field: getattr(task, field) for field in TASK_FIELDS}}
+    ).decode()
+
+def deleted_event(task_id: int, type: str = "deleted") -> str:
+    return serialization.dumps({"type": type, "id": task_id}).decode()
+
+async def publish(owner_id: int, events: List[str]) -> None:
+    """
+    Records and broadcasts the owner's events in one round trip. Called after
+    the database commit, so a Redis failure is logged rather than raised.
+    """
+    if not events:
+        return
+    retention_ms = int(config.TASK_EVENTS_RETENTION_SECONDS * 1000)
+    try:
+        await _publish_script(
+            keys=[_stream_key(owner_id)], args=[retention_ms, _channel(owner_id), *events]
+        )
+    except RedisError:
+        logger.warning("Could not publish task events", exc_info=True)
+
+async def history(owner_id: int, after: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    The owner's (id, event) pairs recorded after the event id `after`, or None
+    when that id is older than the retained history or the history cannot be
+    read, in which case events may have been lost and the client has to
+    reload its tasks.
+    """
+    ms, _ = parse_event_id(after)
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.time()
+            pipe.xrange(_stream_key(owner_id), min=f"({after}", max="+")
+            (seconds, micros), entries = await pipe.execute()
+    except RedisError:
+        logger.warning("Could not read task events history", exc_info=True)
+        return None
+    now_ms = seconds * 1000 + micros // 1000
+    if ms < now_ms - config.TASK_EVENTS_RETENTION_SECONDS * 1000:
+        return None
+    return [(event_id, fields["data"]) for event_id, fields in entries]
+
+
+class Subscription:
+    """Live events of one owner for one listener, in arrival order."""
+
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.TASK_EVENTS_QUEUE_SIZE)
+        # Set when events were dropped, because the listener fell behind or
+        # the worker lost its Redis subscription. The listener should then
+        # close, so the client resumes from its last event id.
+        self.lost = asyncio.Event()
+
+    def _deliver(self, event_id: str, data: str) -> None:
+        try:
+            self.queue.put_nowait((event_id, data))
+        except asyncio.QueueFull:
+            self.lost.set()
+
+    async def get(self, timeout: float) -> Optional[Tuple[str, str]]:
+        """Next (id, event), or None after `timeout` seconds or once events were lost."""
+        if self.lost.is_set():
+            return None
+        get = asyncio.ensure_future(self.queue.get())
+        lost = asyncio.ensure_future(self.lost.wait())
+        done, pending = await asyncio.wait({get, lost}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for future in pending:
+            future.cancel()
+        if get in done:
+            return get.result()
+        return None
+
+
+class _Broker:
+    """The worker's single Redis subscription, shared by all its listeners."""
+
+    def __init__(self):
+        self.subscriptions: Dict[int, Set[Subscription]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subs) for subs in self.subscriptions.values())
+
+    async def add(self, subscription: Subscription) -> None:
+        self.subscriptions.setdefault(subscription.owner_id, set()).add(subscription)
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._listen(self._ready))
+        await self._ready.wait()
+
+    def remove(self, subscription: Subscription) -> None:
+        subs = self.subscriptions.get(subscription.owner_id)
+        if subs is not None:
+            subs.discard(subscription)
+            if not subs:
+                del self.subscriptions[subscription.owner_id]
+        if not self.subscriptions and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _listen(self, ready: asyncio.Event) -> None:
+        # `ready` is this listener's own event: once remove() has cancelled
+        # it, add() may already have started a successor with a new one.
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            ready.set()
+            while True:
+                # listen() reads with the pool's socket timeout and raises
+                # after every quiet spell; a timed get_message returns None.
+                message = await pubsub.get_message(timeout=SUBSCRIPTION_POLL_SECONDS)
+                if message is None or message["type"] != "pmessage":
+                    continue
+                try:
+                    owner_id = int(message["channel"][len(CHANNEL_PREFIX):])
+                except ValueError:
+                    logger.warning("Ignoring task event on channel %r", message["channel"])
+                    continue
+                event_id, _, data = message["data"].partition(" ")
+                for subscription in self.subscriptions.get(owner_id, ()):
+                    subscription._deliver(event_id, data)
+        except RedisError:
+            logger.warning("Lost the task events subscription", exc_info=True)
+        finally:
+            ready.set()
+            if self._task is asyncio.current_task():
+                # Whoever is still listening may have missed events; they
+                # resume from their last event id on reconnect. A replaced
+                # listener leaves the subscribers to its successor.
+                for subs in self.subscriptions.values():
+                    for subscription in subs:
+                        subscription.lost.set()
+            await pubsub.aclose()
+
+
+_broker = _Broker()
+
+def connection_count() -> int:
+    """Number of live listeners in this worker."""
+    return _broker.connections
+
+@asynccontextmanager
+async def subscribe(owner_id: int) -> AsyncIterator[Subscription]:
+    """
+    Listens to the owner's events. Events published once this is entered are
+    delivered, so history read afterwards leaves no gap.
+    """
+    subscription = Subscription(owner_id)
+    try:
+        await _broker.add(subscription)
+        yield subscription
+    finally:
+        _broker.remove(subscription)
@@ -0,0 +1,119 @@
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core import config
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Per-owner counters kept by the task write paths when TASK_STATS_COUNTERS is
+# on: a hash with the open/completed counts, and a sorted set of open task ids
+# scored by due date so the overdue count is a single ZCOUNT.
+COUNTS_KEY_PREFIX = "task_stats:"
+DUE_KEY_PREFIX = "task_stats_due:"
+# Counters are rebuilt from the database at least this often, which bounds
+# any drift from a write that raced the initial load.
+TTL_SECONDS = 6 * 60 * 60
+
+# Only adjusts counters that have been loaded; an owner whose counters are not
+# in Redis gets them rebuilt from the database on the next read.
+APPLY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'open', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'completed', ARGV[2])
+local removed = tonumber(ARGV[3])
+for i = 4, 3 + removed do
+    redis.call('ZREM', KEYS[2], ARGV[i])
+end
+for i = 4 + removed, #ARGV, 2 do
+    redis.call('ZADD', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# (completed before, completed after) for each written task; None means the
+# task did not exist on that side of the write.
+Transition = Tuple[Optional[bool], Optional[bool]]
+
+_apply_script = redis_client.register_script(APPLY_SCRIPT)
+
+def _keys(owner_id: int) -> Tuple[str, str]:
+    return f"{COUNTS_KEY_PREFIX}{owner_id}", f"{DUE_KEY_PREFIX}{owner_id}"
+
+async def get_counts(owner_id: int) -> Optional[Dict[str, int]]:
+    """Open, completed and overdue counts from Redis, or None if not loaded."""
+    counts_key, due_key = _keys(owner_id)
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(counts_key)
+            pipe.zcount(due_key, "-inf", time.time())
+            counts, overdue = await pipe.execute()
+    except RedisError:
+        logger.warning("Could not read task stats counters", exc_info=True)
+        return None
+    if not counts:
+        return None
+    return {"open": int(counts["open"]), "completed": int(counts["completed"]), "overdue": overdue}
+
+async def prime(owner_id: int, *, open: int, completed: int, due: Dict[int, float]) -> None:
+    """Loads an owner's counters computed from the database."""
+    counts_key, due_key = _keys(owner_id)
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(counts_key, due_key)
+            pipe.hset(counts_key, mapping={"open": open, "completed": completed})
+            if due:
+                pipe.zadd(due_key, {str(task_id): score for task_id, score in due.items()})
+            pipe.expire(counts_key, TTL_SECONDS)
+            pipe.expire(due_key, TTL_SECONDS)
+            await pipe.execute()
+    except RedisError:
+        logger.warning("Could not load task stats counters", exc_info=True)
+
+async def record(
+    owner_id: int,
+    *,
+    transitions: Iterable[Transition] = (),
+    saved: Iterable = (),
+    deleted_ids: Iterable[int] = (),
+) -> None:
+    """
+    Applies a task write to the owner's counters: completion `transitions`,
+    plus the due dates of `saved` tasks (anything with `id`, `due_date` and
+    `is_completed`) and the removal of `deleted_ids`.
+    """
+    if not config.TASK_STATS_COUNTERS:
+        return
+    open_delta = completed_delta = 0
+    for before, after in transitions:
+        if before is not None:
+            if before:
+                completed_delta -= 1
+            else:
+                open_delta -= 1
+        if after is not None:
+            if after:
+                completed_delta += 1
+            else:
+                open_delta += 1
+    removed = [str(task_id) for task_id in deleted_ids]
+    upserts = []
+    for task in saved:
+        if task.due_date is not None and not task.is_completed:
+            upserts.extend([task.due_date.timestamp(), str(task.id)])
+        else:
+            removed.append(str(task.id))
+    if not (open_delta or completed_delta or removed or upserts):
+        return
+    try:
+        await _apply_script(
+            keys=list(_keys(owner_id)),
+            args=[open_delta, completed_delta, len(removed), *removed, *upserts],
+        )
+    except RedisError:
+        logger.warning("Could not update task stats counters", exc_info=True)
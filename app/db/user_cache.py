@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.db import crud
+from app.db.redis import redis_client
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Only the public principal fields are cached; the password hash never
+# leaves the database.
+REDIS_KEY_PREFIX = "user_principal:"
+# Every worker listens here and drops the user ids it receives from its
+# in-process tier, so an update or delete in one worker reaches all of them.
+INVALIDATION_CHANNEL = "user_principal_invalidations"
+# Longest single read on the invalidation subscription, see
+# app.db.task_events.SUBSCRIPTION_POLL_SECONDS.
+SUBSCRIPTION_POLL_SECONDS = 1.0
+# Minimum delay between subscription attempts while Redis is unavailable.
+RESUBSCRIBE_SECONDS = 5.0
+# Session.info entry holding the ids of users changed in the open transaction.
+_CHANGED_USERS = "user_cache_changed_ids"
+
+_local_cache = TTLCache(maxsize=config.USER_CACHE_MAX_SIZE, ttl=config.USER_CACHE_TTL_SECONDS)
+_pending_invalidations: set = set()
+_listener: Optional[asyncio.Task] = None
+_listener_started_at = 0.0
+
+def _redis_key(user_id: int) -> str:
+    return f"{REDIS_KEY_PREFIX}{user_id}"
+
+def _principal_data(user: User) -> dict:
+    return {"id": user.id, "email": user.email}
+
+def _to_principal(data: dict) -> User:
+    # A transient User carrying just the cached columns. It is never added to
+    # a session, so relationships are not available on it.
+    return User(id=data["id"], email=data["email"])
+
+async def get_user(db: AsyncSession, *, user_id: int) -> Optional[User]:
+    """
+    Resolves a user by id through the in-process cache, then the optional
+    Redis tier, and finally the database. Either way the result is a
+    transient User with only the principal fields (id and email).
+    """
+    _ensure_listener()
+    data = _local_cache.get(user_id)
+    if data is None and config.USER_CACHE_REDIS:
+        raw = await redis_client.get(_redis_key(user_id))
+        if raw is not None:
+            data = json.loads(raw)
+            _local_cache.set(user_id, data)
+    if data is not None:
+        return _to_principal(data)
+
+    user = await crud.get_user_by_id(db, user_id=user_id)
+    if user is None:
+        return None
+    data = _principal_data(user)
+    _local_cache.set(user_id, data)
+    if config.USER_CACHE_REDIS:
+        await redis_client.set(
+            _redis_key(user_id), json.dumps(data), ex=max(1, int(config.USER_CACHE_TTL_SECONDS))
+        )
+    return _to_principal(data)
+
+async def invalidate_user(user_id: int) -> None:
+    """Drops a user from every cache tier, in every worker."""
+    _local_cache.pop(user_id)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            if config.USER_CACHE_REDIS:
+                pipe.delete(_redis_key(user_id))
+            pipe.publish(INVALIDATION_CHANNEL, user_id)
+            await pipe.execute()
+    except RedisError:
+        logger.warning("Could not invalidate cached user %d", user_id, exc_info=True)
+
+def clear() -> None:
+    """Empties the in-process tier."""
+    _local_cache.clear()
+
+def _ensure_listener() -> None:
+    global _listener, _listener_started_at
+    if _listener is not None:
+        if not _listener.done() or time.monotonic() - _listener_started_at < RESUBSCRIBE_SECONDS:
+            return
+    _listener_started_at = time.monotonic()
+    _listener = asyncio.create_task(_listen_for_invalidations())
+
+async def _listen_for_invalidations() -> None:
+    pubsub = redis_client.pubsub()
+    try:
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        # Entries cached before the subscription was live may have missed
+        # their invalidation.
+        _local_cache.clear()
+        while True:
+            message = await pubsub.get_message(timeout=SUBSCRIPTION_POLL_SECONDS)
+            if message is not None and message["type"] == "message":
+                _local_cache.pop(int(message["data"]))
+    except RedisError:
+        logger.warning("Lost the user cache invalidation subscription", exc_info=True)
+    finally:
+        # Invalidations are missed until a later lookup subscribes again.
+        _local_cache.clear()
+        await pubsub.aclose()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target: User) -> None:
+    # Mapper events run during the flush, before the change is committed; a
+    # worker invalidating now could reload the old row and cache it again.
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    # Session events are synchronous; the local entries are dropped right away
+    # and the Redis delete and the broadcast to other workers are scheduled on
+    # the running loop.
+    user_ids = session.info.pop(_CHANGED_USERS, None)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        _local_cache.pop(user_id)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    for user_id in user_ids:
+        task = loop.create_task(invalidate_user(user_id))
+        _pending_invalidations.add(task)
+        task.add_done_callback(_pending_invalidations.discard)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session) -> None:
+    session.info.pop(_CHANGED_USERS, None)
@@ -1,17 +1,74 @@
+import logging
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse
+
 from app.api.router import api_router
+from app.core import config
+from app.db.redis import redis_client
+from app.db.session import engine
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse if config.FAST_JSON else JSONResponse)
 
-# Run Alembic migrations at startup
-from app.alembic_runner import run_migrations
+logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
-def apply_migrations():
-    run_migrations()
+async def check_database_schema():
+    # Migrations are a deploy step (`python -m app.alembic_runner`); workers
+    # only verify the schema they are about to serve.
+    from app import alembic_runner
+
+    if config.RUN_MIGRATIONS_ON_STARTUP:
+        await run_in_threadpool(alembic_runner.run_migrations)
+        return
+    if config.SCHEMA_CHECK == "off":
+        return
+    problem = await alembic_runner.check_schema(engine)
+    if problem is None:
+        return
+    if config.SCHEMA_CHECK == "fail":
+        raise RuntimeError(problem)
+    logger.warning(problem)
+
+@app.on_event("shutdown")
+async def close_connections():
+    # Runs once uvicorn has drained in-flight requests.
+    await engine.dispose()
+    await redis_client.aclose()
 
 app.include_router(api_router)
 
+if config.LOAD_SHEDDING_ENABLED:
+    from app.core.load_shedding import LoadSheddingMiddleware
+    from app.db.session import pool_overloaded
+
+    # Added before the metrics middleware, so shed requests are measured too.
+    app.add_middleware(
+        LoadSheddingMiddleware,
+        is_overloaded=lambda: pool_overloaded(engine, config.LOAD_SHED_POOL_WAIT_SECONDS),
+        retry_after=config.LOAD_SHED_RETRY_AFTER_SECONDS,
+    )
+
+if config.METRICS_ENABLED:
+    from app.api.endpoints import metrics as metrics_endpoint
+    from app.core import logs, metrics
+    from app.core.security import password_hash_queue_depth
+    from app.db import task_events
+    from app.db.redis import pool_status as redis_pool_status
+    from app.db.session import instrument_queries, pool_status
+
+    instrument_queries(engine.sync_engine)
+    metrics.add_gauges(lambda: {f"db_pool_{name}": value for name, value in pool_status(engine).items()})
+    metrics.add_gauges(lambda: {
+        "password_hash_queue_depth": password_hash_queue_depth(),
+        "task_events_connections": task_events.connection_count(),
+    })
+    metrics.add_gauges(lambda: {f"redis_pool_{name}": value for name, value in redis_pool_status(redis_client).items()})
+    metrics.add_gauges(lambda: {"log_records_dropped": logs.dropped_records()})
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(metrics_endpoint.router)
+
 @app.get("/")
 def read_root():
     return {"message": "Server is running"}
@@ -1,16 +1,56 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, Boolean, DateTime, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from app.models.base import Base
 
+# Text search configuration used for the generated search vector and queries.
+SEARCH_CONFIG = "english"
+
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True, nullable=False)
+    title = Column(String, nullable=False)
     description = Column(String, nullable=True)
     due_date = Column(DateTime(timezone=True), nullable=True)
     is_completed = Column(Boolean, default=False)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    # When the task was last marked completed; the archiver moves tasks
+    # completed long enough ago to task_archive.
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    # Client-supplied Idempotency-Key of the request that created the task,
+    # and a hash of that request's body to recognise a key reused for another.
+    idempotency_key = Column(String, nullable=True)
+    idempotency_request_hash = Column(String(64), nullable=True)
+    # Maintained by Postgres; deferred so ORM loads never fetch it.
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            f"to_tsvector('{SEARCH_CONFIG}', coalesce(title, '') || ' ' || coalesce(description, ''))",
+            persisted=True,
+        ),
+    ))
 
     owner = relationship("User", back_populates="tasks")
+
+    __table_args__ = (
+        # Serves the per-owner listing: owner filter, optional status filter, keyset on id.
+        Index("ix_tasks_owner_id_is_completed_id", "owner_id", "is_completed", "id"),
+        # Serves due date ranges and the due date ordering of the listing.
+        Index("ix_tasks_owner_id_due_date_id", "owner_id", "due_date", "id"),
+        # Serves the overdue scan, which only ever looks at open tasks.
+        Index("ix_tasks_due_date_open", "due_date", postgresql_where=text("is_completed = false")),
+        # Serves the archiver's scan for tasks completed before a cutoff.
+        Index("ix_tasks_completed_at", "completed_at", postgresql_where=text("is_completed = true")),
+        # Serves full-text search over title and description.
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+        # Makes retried creations with the same Idempotency-Key return the first task.
+        Index(
+            "uq_tasks_owner_id_idempotency_key",
+            "owner_id",
+            "idempotency_key",
+            unique=True,
+            postgresql_where=text("idempotency_key IS NOT NULL"),
+        ),
+    )
@@ -0,0 +1,35 @@
+from sqlalchemy import DDL, Column, DateTime, ForeignKey, Index, Integer, String, event, func
+
+from app.models.base import Base
+
+DEFAULT_PARTITION = "task_archive_default"
+
+class ArchivedTask(Base):
+    """
+    A completed task moved out of `tasks` by the archiver. The table is
+    partitioned by month of archival; the archiver creates the partitions,
+    and the default partition only catches rows nobody made a partition for.
+    """
+    __tablename__ = "task_archive"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    due_date = Column(DateTime(timezone=True), nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    # Part of the primary key because Postgres requires the partition key there.
+    archived_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+
+    __table_args__ = (
+        # Serves the per-owner archive listing, keyset on id.
+        Index("ix_task_archive_owner_id_id", "owner_id", "id"),
+        {"postgresql_partition_by": "RANGE (archived_at)"},
+    )
+
+# Mirrors the migration for databases built with metadata.create_all.
+event.listen(
+    ArchivedTask.__table__,
+    "after_create",
+    DDL(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF task_archive DEFAULT"),
+)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import List, Literal, Optional
 
 # Schema for creating a task
 class TaskCreate(BaseModel):
@@ -15,6 +15,17 @@ class TaskUpdate(BaseModel):
     due_date: Optional[datetime] = None
     is_completed: Optional[bool] = None
 
+MAX_SEARCH_LENGTH = 200
+
+# Query parameters for listing tasks
+class TaskFilter(BaseModel):
+    is_completed: Optional[bool] = None
+    due_after: Optional[datetime] = None
+    due_before: Optional[datetime] = None
+    overdue: bool = False
+    q: Optional[str] = Field(None, min_length=1, max_length=MAX_SEARCH_LENGTH)
+    sort: Literal["id", "due_date"] = "id"
+
 # Base schema for a task, used for responses
 class Task(BaseModel):
     id: int
@@ -25,4 +36,56 @@ class Task(BaseModel):
     owner_id: int
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+# A completed task moved to the archive, used for responses
+class ArchivedTask(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    owner_id: int
+    completed_at: Optional[datetime] = None
+    archived_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Task counts for one due date bucket of the stats histogram
+class TaskStatsBucket(BaseModel):
+    start: date
+    open: int
+    completed: int
+
+# Aggregate task counts, used by dashboards
+class TaskStats(BaseModel):
+    total: int
+    open: int
+    completed: int
+    overdue: int
+    bucket: Optional[Literal["day", "week"]] = None
+    histogram: List[TaskStatsBucket] = []
+
+MAX_BULK_ITEMS = 1000
+
+# Schema for creating many tasks in one request
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+# Schema for applying the same changes to many tasks in one request
+class TaskBulkUpdate(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+    changes: TaskUpdate
+
+# Schema for deleting many tasks in one request
+class TaskBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+# Outcome of a single item in a bulk request
+class TaskBulkItemResult(BaseModel):
+    id: int
+    status: Literal["created", "updated", "deleted", "not_found"]
+    task: Optional[Task] = None
+
+class TaskBulkResult(BaseModel):
+    results: List[TaskBulkItemResult]
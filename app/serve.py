@@ -0,0 +1,76 @@
+"""
+Production entrypoint: runs the API in several uvicorn worker processes.
+
+    python -m app.serve
+
+Settings come from app.core.config (WEB_* and DB_CONNECTION_BUDGET).
+"""
+import importlib.util
+import logging
+import os
+from typing import Dict
+
+import uvicorn
+
+from app.core import config, logs
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    return config.WEB_WORKERS or os.cpu_count() or 1
+
+
+def pool_settings(workers: int, budget: int) -> Dict[str, int]:
+    """
+    Splits a global connection budget across workers: half of each worker's
+    share is kept open, the rest is overflow opened under load, so the
+    server never holds more than `budget` connections.
+    """
+    per_worker = max(1, budget // workers)
+    if budget < workers:
+        logger.warning(
+            "DB_CONNECTION_BUDGET=%d is less than one connection per worker; using 1 each", budget
+        )
+    pool_size = max(1, per_worker // 2)
+    return {"pool_size": pool_size, "max_overflow": per_worker - pool_size}
+
+
+def main() -> None:
+    workers = worker_count()
+    if config.DB_CONNECTION_BUDGET:
+        pool = pool_settings(workers, config.DB_CONNECTION_BUDGET)
+        # Workers are separate interpreters that read their settings from
+        # the environment when app.core.config is imported.
+        os.environ["DB_POOL_SIZE"] = str(pool["pool_size"])
+        os.environ["DB_MAX_OVERFLOW"] = str(pool["max_overflow"])
+    # uvloop and httptools are optional C speedups; fall back to the pure
+    # Python implementations when they are not installed.
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    logger.info(
+        "Starting %d workers (loop=%s, http=%s, pool_size=%s, max_overflow=%s)",
+        workers, loop, http,
+        os.environ.get("DB_POOL_SIZE", config.DB_POOL_SIZE),
+        os.environ.get("DB_MAX_OVERFLOW", config.DB_MAX_OVERFLOW),
+    )
+    # On SIGTERM/SIGINT each worker stops accepting connections, waits up to
+    # WEB_GRACEFUL_SHUTDOWN_SECONDS for in-flight requests and then runs the
+    # app's shutdown hooks, which dispose of the engine.
+    uvicorn.run(
+        "app.main:app",
+        host=config.WEB_HOST,
+        port=config.WEB_PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_keep_alive=config.WEB_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=config.WEB_GRACEFUL_SHUTDOWN_SECONDS,
+        proxy_headers=True,
+        log_config=logs.uvicorn_log_config(),
+    )
+
+
+if __name__ == "__main__":
+    logs.configure_logging()
+    main()
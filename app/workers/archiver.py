@@ -0,0 +1,87 @@
+"""
+Moves completed tasks out of the hot `tasks` table.
+
+Tasks completed more than ARCHIVE_AFTER_DAYS ago are moved to the
+`task_archive` table in batches of ARCHIVE_BATCH_SIZE, one short
+transaction each, so locks are never held for long and foreground writes
+are not blocked. The archive is partitioned by month of archival; this job
+creates the partitions for the current and the next month before moving
+anything, so rows never land in the default partition. Any number of
+archivers can run at once.
+
+    python -m app.workers.archiver          # every ARCHIVE_INTERVAL_SECONDS
+    python -m app.workers.archiver --once   # one pass, e.g. from cron
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core import config, logs
+from app.db import crud
+from app.db.session import AsyncSessionLocal, engine
+
+# Serializes partition DDL between concurrent archivers.
+PARTITION_LOCK_ID = 0x7461736B5F617263
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+def partition_name(month: date) -> str:
+    return f"task_archive_{month:%Y_%m}"
+
+async def ensure_partitions(bind: AsyncEngine = engine, *, today: Optional[date] = None) -> None:
+    """Creates the monthly archive partitions for this month and the next, if missing."""
+    this_month = _month_start(today or datetime.now(timezone.utc).date())
+    async with bind.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": PARTITION_LOCK_ID})
+        for month in (this_month, _next_month(this_month)):
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF task_archive "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            ))
+
+async def archive_once(
+    *,
+    after_days: int = config.ARCHIVE_AFTER_DAYS,
+    batch_size: int = config.ARCHIVE_BATCH_SIZE,
+    pause: float = config.ARCHIVE_BATCH_PAUSE_SECONDS,
+) -> int:
+    """Moves every task completed more than `after_days` ago. Returns how many were moved."""
+    await ensure_partitions()
+    completed_before = datetime.now(timezone.utc) - timedelta(days=after_days)
+    moved = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = await crud.archive_completed_tasks(
+                db, completed_before=completed_before, batch_size=batch_size
+            )
+        moved += len(rows)
+        if len(rows) < batch_size:
+            return moved
+        await asyncio.sleep(pause)
+
+async def main(once: bool) -> None:
+    while True:
+        moved = await archive_once()
+        logging.info(f"Archived {moved} completed tasks.")
+        if once:
+            return
+        await asyncio.sleep(config.ARCHIVE_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    logs.configure_logging()
+    parser = argparse.ArgumentParser(description="Move long-completed tasks to the archive.")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.once))
+    except KeyboardInterrupt:
+        logging.info("Archiver stopped.")
@@ -1,37 +1,211 @@
 import asyncio
 import logging
-import sys
-import os
-
-# Add project root to the Python path to avoid circular import issues
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-
-import json
+import random
 import time
+from itertools import groupby
+from typing import Awaitable, Callable, List, Optional
+
+from app.core import config, logs
+from app.db import crud
 from app.db.redis import redis_client
+from app.db.reminder_schedule import DEAD_LETTER_KEY, SCHEDULE_KEY, PROCESSING_KEY
+from app.db.session import AsyncSessionLocal
+from app.workers.reminder_sinks import DueTask, Notification, Sink, create_sink
+
+# Atomically moves up to ARGV[2] due members from the schedule into the
+# processing set with a lease, after first returning expired leases (from a
+# worker that died mid-batch) to the schedule. Because the whole script runs
+# atomically, concurrent workers never claim the same member.
+CLAIM_SCRIPT = """
+local schedule, processing = KEYS[1], KEYS[2]
+local now, limit, lease_until = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+
+local expired = redis.call('ZRANGEBYSCORE', processing, '-inf', now, 'LIMIT', 0, limit)
+for _, member in ipairs(expired) do
+    redis.call('ZADD', schedule, now, member)
+    redis.call('ZREM', processing, member)
+end
+
+local due = redis.call('ZRANGEBYSCORE', schedule, '-inf', now, 'LIMIT', 0, limit)
+for _, member in ipairs(due) do
+    redis.call('ZREM', schedule, member)
+    redis.call('ZADD', processing, lease_until, member)
+end
+return due
+"""
+
+Handler = Callable[[List[str]], Awaitable[None]]
+
+_claim_scripts = {}
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def _claim_script(client):
+    script = _claim_scripts.get(client)
+    if script is None:
+        script = _claim_scripts[client] = client.register_script(CLAIM_SCRIPT)
+    return script
 
-async def reminder_worker():
-    while True:
-        now = int(time.time())
-        # Get all tasks that are now due from Redis
-        tasks = await redis_client.zrangebyscore("overdue_tasks_schedule", 0, now)
+class ReminderPipeline:
+    """
+    The handler of a claimed batch: loads the batch's open tasks with their
+    owners in one query, groups them into one notification per user and
+    delivers those through `sink`, at most `concurrency` at a time. A failed
+    delivery is retried `retries` times with jittered exponential backoff;
+    then its reminders are moved to the dead-letter set, so the batch can
+    still be acknowledged. Deliveries still running after `deadline` seconds
+    are cancelled and dead-lettered the same way, so that a slow sink cannot
+    hold a batch past its lease.
+    """
 
-        for task_json in tasks:
-            task = json.loads(task_json)
-            logging.warning(f"Reminder: Task '{task['title']}' is overdue!")
-            # Remove from schedule once processed
-            await redis_client.zrem("overdue_tasks_schedule", task_json)
+    def __init__(
+        self,
+        sink: Sink,
+        *,
+        client=redis_client,
+        session_factory=AsyncSessionLocal,
+        concurrency: int = config.REMINDER_DELIVERY_CONCURRENCY,
+        retries: int = config.REMINDER_DELIVERY_RETRIES,
+        backoff_base: float = config.REMINDER_RETRY_BACKOFF_BASE,
+        backoff_cap: float = config.REMINDER_RETRY_BACKOFF_CAP,
+        deadline: float = config.REMINDER_DELIVERY_DEADLINE_SECONDS,
+    ):
+        self.sink = sink
+        self.client = client
+        self.session_factory = session_factory
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.deadline = deadline
+        self._slots = asyncio.Semaphore(concurrency)
 
-        await asyncio.sleep(10)
+    async def load(self, members: List[str]) -> List[Notification]:
+        # Members are task ids. Completed or deleted tasks are simply absent.
+        async with self.session_factory() as db:
+            rows = await crud.get_reminder_rows(db, ids=[int(member) for member in members])
+        notifications = []
+        for owner_id, group in groupby(rows, key=lambda row: row.owner_id):
+            owner_rows = list(group)
+            notifications.append(Notification(
+                owner_id=owner_id,
+                email=owner_rows[0].email,
+                tasks=[DueTask(row.id, row.title, row.due_date) for row in owner_rows],
+            ))
+        return notifications
+
+    async def deliver(self, notification: Notification) -> bool:
+        """Sends one notification with retries. Returns whether it got through."""
+        async with self._slots:
+            for attempt in range(self.retries + 1):
+                try:
+                    await self.sink.send(notification)
+                    return True
+                except Exception:
+                    if attempt == self.retries:
+                        logging.exception(
+                            "Giving up on %d reminders for user %d",
+                            len(notification.tasks), notification.owner_id,
+                        )
+                        return False
+                delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+
+    async def dead_letter(self, notifications: List[Notification]) -> None:
+        now = time.time()
+        await self.client.zadd(
+            DEAD_LETTER_KEY, {str(task.id): now for notification in notifications for task in notification.tasks}
+        )
+
+    async def __call__(self, members: List[str]) -> None:
+        started = time.monotonic()
+        notifications = await self.load(members)
+        deliveries = [asyncio.create_task(self.deliver(notification)) for notification in notifications]
+        if not deliveries:
+            return
+        remaining = max(self.deadline - (time.monotonic() - started), 0.0)
+        _, pending = await asyncio.wait(deliveries, timeout=remaining)
+        for delivery in pending:
+            delivery.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logging.error(
+                "Reminder delivery deadline of %.0fs passed with %d deliveries pending", self.deadline, len(pending)
+            )
+        failed = [
+            notification
+            for notification, delivery in zip(notifications, deliveries)
+            if delivery in pending or not delivery.result()
+        ]
+        if failed:
+            await self.dead_letter(failed)
+
+async def claim_due(client, *, batch_size: int, lease_seconds: float) -> List[str]:
+    """Claims up to `batch_size` due reminders for this worker."""
+    now = time.time()
+    return await _claim_script(client)(
+        keys=[SCHEDULE_KEY, PROCESSING_KEY], args=[now, batch_size, now + lease_seconds]
+    )
+
+async def ack(client, members: List[str]) -> None:
+    """Acknowledges processed reminders in one pipelined round trip."""
+    if not members:
+        return
+    async with client.pipeline(transaction=False) as pipe:
+        for member in members:
+            pipe.zrem(PROCESSING_KEY, member)
+        await pipe.execute()
+
+async def seconds_until_next_due(client, *, max_idle: float) -> float:
+    """Time until the earliest scheduled reminder or lease expiry, capped at `max_idle`."""
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.zrange(SCHEDULE_KEY, 0, 0, withscores=True)
+        pipe.zrange(PROCESSING_KEY, 0, 0, withscores=True)
+        next_due, next_expiry = await pipe.execute()
+    scores = [entry[0][1] for entry in (next_due, next_expiry) if entry]
+    if not scores:
+        return max_idle
+    return min(max(min(scores) - time.time(), 0.0), max_idle)
+
+async def reminder_worker(
+    client=redis_client,
+    *,
+    handler: Handler,
+    batch_size: int = config.REMINDER_BATCH_SIZE,
+    lease_seconds: float = config.REMINDER_LEASE_SECONDS,
+    max_idle: float = config.REMINDER_MAX_IDLE_SECONDS,
+    stop: Optional[asyncio.Event] = None,
+):
+    """
+    Claims due reminders in bounded batches, hands them to `handler` and
+    acknowledges them. When nothing is due it sleeps until the next due
+    score (at most `max_idle`, so newly scheduled reminders are not missed).
+    Any number of workers can run against the same Redis. Delivery is at
+    least once: a batch whose lease runs out before it is acknowledged is
+    claimed and delivered again.
+    """
+    while stop is None or not stop.is_set():
+        members = await claim_due(client, batch_size=batch_size, lease_seconds=lease_seconds)
+        if members:
+            try:
+                await handler(members)
+            except Exception:
+                # Left unacknowledged; the leases expire and the batch is retried.
+                logging.exception("Reminder handler failed for %d reminders", len(members))
+            else:
+                await ack(client, members)
+            if len(members) == batch_size:
+                # A full batch means more is probably due right now.
+                continue
+        await asyncio.sleep(await seconds_until_next_due(client, max_idle=max_idle))
 
 async def main():
     logging.info("Starting Redis-based reminder worker...")
-    await reminder_worker()
+    sink = create_sink()
+    try:
+        await reminder_worker(handler=ReminderPipeline(sink))
+    finally:
+        await sink.aclose()
 
 if __name__ == "__main__":
+    logs.configure_logging()
     logging.info("Starting reminder worker...")
     try:
         asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Where the reminder worker delivers reminders. A sink receives one
+notification per user and batch, and raises to have it retried.
+"""
+import asyncio
+import logging
+import smtplib
+from datetime import datetime
+from email.message import EmailMessage
+from typing import List, NamedTuple, Optional, Protocol
+
+from app.core import config
+from app.core.logs import UNSAMPLED
+
+logger = logging.getLogger(__name__)
+
+class DueTask(NamedTuple):
+    id: int
+    title: str
+    due_date: Optional[datetime]
+
+class Notification(NamedTuple):
+    """The due tasks of one user from one claimed batch."""
+    owner_id: int
+    email: str
+    tasks: List[DueTask]
+
+    def to_dict(self) -> dict:
+        return {
+            "owner_id": self.owner_id,
+            "email": self.email,
+            "tasks": [
+                {
+                    "id": task.id,
+                    "title": task.title,
+                    "due_date": task.due_date.isoformat() if task.due_date else None,
+                }
+                for task in self.tasks
+            ],
+        }
+
+class Sink(Protocol):
+    async def send(self, notification: Notification) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+class LogSink:
+    """
+    Logs one record per notification. These records are the delivery, so
+    they bypass log sampling and are never dropped from the log queue.
+    """
+
+    async def send(self, notification: Notification) -> None:
+        logger.warning(
+            "Reminder: %d overdue tasks for user %d: %s",
+            len(notification.tasks),
+            notification.owner_id,
+            ", ".join(f"'{task.title}'" for task in notification.tasks),
+            extra={**UNSAMPLED, "task_ids": [task.id for task in notification.tasks]},
+        )
+
+    async def aclose(self) -> None:
+        pass
+
+class SmtpSink:
+    """Emails the user through an SMTP server; smtplib runs in a thread."""
+
+    def __init__(self, host: str, port: int, sender: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    def _message(self, notification: Notification) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = notification.email
+        count = len(notification.tasks)
+        message["Subject"] = f"{count} overdue task{'s' if count != 1 else ''}"
+        message.set_content("\n".join(f"- {task.title}" for task in notification.tasks))
+        return message
+
+    def _send(self, message: EmailMessage) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+    async def send(self, notification: Notification) -> None:
+        await asyncio.to_thread(self._send, self._message(notification))
+
+    async def aclose(self) -> None:
+        pass
+
+class WebhookSink:
+    """POSTs the notification as JSON; any non-2xx response is a failure."""
+
+    def __init__(self, url: str, timeout: float):
+        # Only imported by workers that deliver to a webhook.
+        import httpx
+
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, notification: Notification) -> None:
+        response = await self._client.post(self.url, json=notification.to_dict())
+        response.raise_for_status()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+def create_sink(kind: str = config.REMINDER_SINK) -> Sink:
+    """Builds the sink named by REMINDER_SINK from its settings."""
+    if kind == "log":
+        return LogSink()
+    if kind == "smtp":
+        return SmtpSink(
+            config.REMINDER_SMTP_HOST,
+            config.REMINDER_SMTP_PORT,
+            config.REMINDER_SMTP_SENDER,
+            config.REMINDER_SINK_TIMEOUT_SECONDS,
+        )
+    if kind == "webhook":
+        if not config.REMINDER_WEBHOOK_URL:
+            raise ValueError("REMINDER_WEBHOOK_URL is required for the webhook sink")
+        return WebhookSink(config.REMINDER_WEBHOOK_URL, config.REMINDER_SINK_TIMEOUT_SECONDS)
+    raise ValueError(f"Unknown reminder sink {kind!r}")
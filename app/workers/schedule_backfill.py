@@ -0,0 +1,58 @@
+"""
+Rebuilds the reminder schedule from the database.
+
+Adds every open task with a due date to the Redis schedule and removes
+members whose task is gone, completed or no longer has a due date. Tasks
+are streamed in chunks, so memory stays flat however many there are. Run
+it once after deploying, or whenever the schedule may have drifted:
+
+    python -m app.workers.schedule_backfill
+"""
+import asyncio
+import logging
+
+from app.core import logs
+from app.db import crud, reminder_schedule
+from app.db.redis import redis_client
+from app.db.session import AsyncSessionLocal
+
+CHUNK_SIZE = 1000
+
+async def backfill(client=redis_client, *, chunk_size: int = CHUNK_SIZE) -> int:
+    """Schedules every open task with a due date. Returns how many were scheduled."""
+    scheduled = 0
+    async with AsyncSessionLocal() as db:
+        async for rows in crud.stream_open_task_due_dates(db, chunk_size=chunk_size):
+            await reminder_schedule.sync_tasks(rows, client=client)
+            scheduled += len(rows)
+    return scheduled
+
+async def remove_stale(client=redis_client, *, chunk_size: int = CHUNK_SIZE) -> int:
+    """Removes scheduled ids whose task is no longer open with a due date."""
+    removed = 0
+    cursor = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            cursor, entries = await client.zscan(
+                reminder_schedule.SCHEDULE_KEY, cursor, count=chunk_size
+            )
+            ids = [int(member) for member, _ in entries]
+            if ids:
+                tasks = await crud.get_tasks_by_ids(db, ids=ids)
+                db.expunge_all()
+                live = {task.id for task in tasks if task.due_date is not None and not task.is_completed}
+                stale = [task_id for task_id in ids if task_id not in live]
+                await reminder_schedule.unschedule_tasks(stale, client=client)
+                removed += len(stale)
+            if cursor == 0:
+                return removed
+
+async def main():
+    removed = await remove_stale()
+    logging.info(f"Removed {removed} stale reminders from the schedule.")
+    scheduled = await backfill()
+    logging.info(f"Scheduled {scheduled} open tasks with a due date.")
+
+if __name__ == "__main__":
+    logs.configure_logging()
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Measures request throughput when every request logs heavily and stderr is
+slow to drain, with the handlers writing on the event loop ("blocking")
+against the queue-based setup of app/core/logs.py, with and without
+sampling.
+
+Requests go to `GET /` in-process through httpx.ASGITransport, so no
+database or Redis is needed. Each one logs --lines records; stderr is
+replaced by a stream that takes --write-ms per write.
+
+    python -m benchmarks.logging_throughput --lines 10 --write-ms 0.2 --duration 5
+"""
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import sys
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core import config, logs
+from app.main import app
+
+logger = logging.getLogger("benchmarks.logging_throughput")
+
+
+class SlowStream(io.TextIOBase):
+    """A stderr stand-in whose writes block like a congested pipe."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        self.writes += 1
+        return len(text)
+
+
+def log_heavy(inner, lines: int):
+    async def logging_app(scope, receive, send):
+        if scope["type"] == "http":
+            for step in range(lines):
+                logger.info("Handled step %d of %s", step, scope["path"])
+        await inner(scope, receive, send)
+    return logging_app
+
+
+def configure(mode: str, stream: SlowStream) -> None:
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    if mode == "blocking":
+        logs.stop_logging()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logs.JsonFormatter())
+        root.handlers[:] = [handler]
+        return
+    config.LOG_SAMPLE_BURST = 100 if mode == "queue+sampling" else 10**9
+    sys.stderr = stream
+    try:
+        logs.configure_logging()
+    finally:
+        sys.stderr = sys.__stderr__
+
+
+async def measure(mode: str, args) -> dict:
+    stream = SlowStream(args.write_ms / 1000)
+    configure(mode, stream)
+    transport = ASGITransport(app=log_heavy(app, args.lines))
+    latencies = []
+    stop_at = time.perf_counter() + args.duration
+
+    async def client_loop(client):
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            (await client.get("/")).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+    dropped = logs.dropped_records() if mode != "blocking" else 0
+    logs.stop_logging()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": len(latencies) / args.duration,
+        "p50": quantiles[49],
+        "p99": quantiles[98],
+        "written": stream.writes,
+        "dropped": dropped,
+    }
+
+
+async def main(args):
+    results = {}
+    for mode in ("blocking", "queue", "queue+sampling"):
+        results[mode] = await measure(mode, args)
+    logging.getLogger().handlers.clear()
+    print(f"{args.lines} log lines per request, {args.write_ms} ms per stderr write, {args.concurrency} clients")
+    for mode, result in results.items():
+        print(
+            f"{mode:15} {result['rps']:8.0f} req/s  p50={result['p50']:.2f} ms  p99={result['p99']:.2f} ms  "
+            f"lines written={result['written']} dropped={result['dropped']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure log-heavy request throughput.")
+    parser.add_argument("--lines", type=int, default=10, help="log records per request")
+    parser.add_argument("--write-ms", type=float, default=0.2, help="time each stderr write blocks")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,106 @@
+"""
+Saturates POST /auth/login while measuring GET /tasks/ latency on the same
+worker, to show that bcrypt no longer stalls the event loop.
+
+The app is driven in-process through httpx.ASGITransport against the
+database configured in app/db/session.py. Pass --blocking to verify
+passwords on the event loop, as the login endpoint used to.
+
+    python -m benchmarks.login_storm --logins 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from httpx import AsyncClient, ASGITransport
+
+from app.api.endpoints import auth
+from app.core import security
+from app.main import app
+
+PASSWORD = "benchmark-password"
+
+
+async def _blocking_verify(plain_password: str, hashed_password: str) -> bool:
+    return security.verify_password(plain_password, hashed_password)
+
+
+async def probe_tasks(client: AsyncClient, headers: dict, stop: asyncio.Event) -> list:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/tasks/", headers=headers, params={"limit": 10})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def login_storm(client: AsyncClient, credentials: dict, *, logins: int, concurrency: int):
+    slots = asyncio.Semaphore(concurrency)
+    max_queue_depth = 0
+
+    async def login():
+        nonlocal max_queue_depth
+        async with slots:
+            response = await client.post("/auth/login", json=credentials)
+            response.raise_for_status()
+            max_queue_depth = max(max_queue_depth, security.password_hash_queue_depth())
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return max_queue_depth
+
+
+def summarize(label: str, latencies: list) -> str:
+    if len(latencies) < 2:
+        return f"{label}: {len(latencies)} samples"
+    quantiles = statistics.quantiles(latencies, n=100)
+    return (
+        f"{label}: n={len(latencies)} p50={quantiles[49]:.1f} ms "
+        f"p95={quantiles[94]:.1f} ms max={max(latencies):.1f} ms"
+    )
+
+
+async def main(args):
+    if args.blocking:
+        auth.verify_password_async = _blocking_verify
+
+    credentials = {"email": f"bench_{uuid.uuid4().hex[:8]}@example.com", "password": PASSWORD}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        (await client.post("/auth/register", json=credentials)).raise_for_status()
+        token = (await client.post("/auth/login", json=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe_tasks(client, headers, stop))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idle = await idle_probe
+
+        stop = asyncio.Event()
+        busy_probe = asyncio.create_task(probe_tasks(client, headers, stop))
+        start = time.perf_counter()
+        max_queue_depth = await login_storm(
+            client, credentials, logins=args.logins, concurrency=args.concurrency
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        busy = await busy_probe
+
+    mode = "blocking" if args.blocking else "pooled"
+    print(f"mode={mode} logins={args.logins} in {elapsed:.1f}s ({args.logins / elapsed:.1f}/s)")
+    print(f"max password hash queue depth: {max_queue_depth}")
+    print(summarize("GET /tasks/ idle", idle))
+    print(summarize("GET /tasks/ during login storm", busy))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /tasks/ latency during a login storm.")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--blocking", action="store_true", help="verify passwords on the event loop")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Measures what rate limiting and load shedding add to each request: the cost
+of one token bucket check against Redis and against the in-process fallback,
+and GET /tasks/ latency with both layers off and on.
+
+The app is driven in-process through httpx.ASGITransport against the
+database configured in app/db/session.py, with limits high enough that no
+request is refused.
+
+    python -m benchmarks.rate_limit --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core import config
+from app.core.load_shedding import LoadSheddingMiddleware
+from app.db import rate_limit
+from app.db.session import engine, pool_overloaded
+from app.main import app
+
+PASSWORD = "benchmark-password"
+LIMIT = rate_limit.Limit(per_minute=1e9, burst=1_000_000)
+
+
+def median_us(samples: list) -> float:
+    return statistics.median(samples) * 1e6
+
+
+async def time_checks(n: int) -> list:
+    identity = uuid.uuid4().hex
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await rate_limit.hit("bench", identity, LIMIT)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def time_local_checks(n: int) -> list:
+    identity = uuid.uuid4().hex
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        rate_limit._hit_local(rate_limit._key("bench", identity), LIMIT)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def time_requests(client: AsyncClient, headers: dict, n: int) -> list:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = await client.get("/tasks/", headers=headers, params={"limit": 10})
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(args):
+    print(f"token bucket check, Redis:      {median_us(await time_checks(args.requests)):8.1f} us")
+    print(f"token bucket check, in-process: {median_us(time_local_checks(args.requests)):8.1f} us")
+
+    config.RATE_LIMIT_TASKS_PER_MINUTE = LIMIT.per_minute
+    config.RATE_LIMIT_TASKS_BURST = LIMIT.burst
+    credentials = {"email": f"bench_{uuid.uuid4().hex[:8]}@example.com", "password": PASSWORD}
+    shedding = LoadSheddingMiddleware(
+        app, is_overloaded=lambda: pool_overloaded(engine, config.LOAD_SHED_POOL_WAIT_SECONDS)
+    )
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as plain, \
+            AsyncClient(transport=ASGITransport(app=shedding), base_url="http://bench") as protected:
+        (await plain.post("/auth/register", json=credentials)).raise_for_status()
+        token = (await plain.post("/auth/login", json=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        await time_requests(plain, headers, 50)
+
+        # Alternate rounds so drift in the database or Redis hits both modes alike.
+        off, on = [], []
+        rounds = 10
+        for _ in range(rounds):
+            config.RATE_LIMIT_ENABLED = False
+            off += await time_requests(plain, headers, args.requests // rounds)
+            config.RATE_LIMIT_ENABLED = True
+            on += await time_requests(protected, headers, args.requests // rounds)
+
+    off_us, on_us = median_us(off), median_us(on)
+    print(f"GET /tasks/ p50 without limits: {off_us:8.1f} us")
+    print(f"GET /tasks/ p50 with limits:    {on_us:8.1f} us")
+    print(f"overhead per request:           {on_us - off_us:8.1f} us ({(on_us / off_us - 1) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the per-request overhead of rate limiting and load shedding.")
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,161 @@
+"""
+Measures the reminder delivery pipeline end to end: claim from Redis, load
+the batch's tasks and owners from Postgres, group per user and deliver
+through a sink with simulated latency and failures.
+
+Seeds a scratch database with 100k overdue tasks spread over users with a
+skewed number of tasks each, schedules them on Redis logical database 15
+and drains the schedule with several workers:
+
+    python -m benchmarks.reminder_delivery --reminders 100000 --workers 4 --latency-ms 5 --failure-rate 0.01
+
+Reports reminders per second, notifications sent, database queries per
+claimed batch, and reminders dead-lettered or delivered twice.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.redis import create_redis_client
+from app.db.reminder_schedule import DEAD_LETTER_KEY
+from app.workers import reminder
+from benchmarks.api_load import BENCH_REDIS_URL
+from benchmarks.common import (
+    BENCH_DATABASE_URL,
+    create_database,
+    drop_database,
+    seed_users_and_tasks,
+    skewed_counts,
+)
+
+
+class SimulatedSink:
+    """Takes `latency` seconds per notification and fails a share of the attempts."""
+
+    def __init__(self, latency: float, failure_rate: float, rng: random.Random):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = rng
+        self.notifications = 0
+        self.delivered = Counter()
+
+    async def send(self, notification):
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError("simulated delivery failure")
+        self.notifications += 1
+        self.delivered.update(task.id for task in notification.tasks)
+
+    async def aclose(self):
+        pass
+
+
+async def seed(engine, client, args, rng) -> int:
+    await create_database()
+    await seed_users_and_tasks(
+        engine, task_counts=skewed_counts(args.reminders, args.users, args.skew, rng), rng=rng
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE tasks SET is_completed = false, due_date = now() - interval '1 hour'"))
+        ids = (await conn.execute(text("SELECT id FROM tasks"))).scalars().all()
+    await client.delete(reminder.SCHEDULE_KEY, reminder.PROCESSING_KEY, DEAD_LETTER_KEY)
+    due = time.time() - 3600
+    for start in range(0, len(ids), 10_000):
+        await client.zadd(reminder.SCHEDULE_KEY, {str(task_id): due for task_id in ids[start:start + 10_000]})
+    return len(ids)
+
+
+async def drained(client) -> bool:
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.zcard(reminder.SCHEDULE_KEY)
+        pipe.zcard(reminder.PROCESSING_KEY)
+        scheduled, processing = await pipe.execute()
+    return scheduled == 0 and processing == 0
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    engine = create_async_engine(BENCH_DATABASE_URL, pool_size=args.workers)
+    control = create_redis_client(BENCH_REDIS_URL)
+    try:
+        print(f"Seeding {args.reminders} overdue tasks across {args.users} users...")
+        total = await seed(engine, control, args, rng)
+
+        queries = 0
+
+        def count_query(*_):
+            nonlocal queries
+            queries += 1
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+        batches = 0
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession)
+        sink = SimulatedSink(args.latency_ms / 1000, args.failure_rate, rng)
+        pipeline = reminder.ReminderPipeline(
+            sink,
+            client=control,
+            session_factory=session_factory,
+            concurrency=args.concurrency,
+            backoff_base=args.backoff,
+        )
+
+        async def handler(members):
+            nonlocal batches
+            batches += 1
+            await pipeline(members)
+
+        stop = asyncio.Event()
+        clients = [create_redis_client(BENCH_REDIS_URL) for _ in range(args.workers)]
+        start = time.perf_counter()
+        workers = [
+            asyncio.create_task(
+                reminder.reminder_worker(client, handler=handler, batch_size=args.batch_size, max_idle=0.05, stop=stop)
+            )
+            for client in clients
+        ]
+        while not await drained(control):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*workers)
+        dead = await control.zcard(DEAD_LETTER_KEY)
+
+        duplicates = sum(count - 1 for count in sink.delivered.values() if count > 1)
+        print(
+            f"workers={args.workers} batch={args.batch_size} concurrency={args.concurrency} "
+            f"latency={args.latency_ms}ms failure_rate={args.failure_rate}"
+        )
+        print(
+            f"{len(sink.delivered)} of {total} reminders delivered in {elapsed:.2f}s "
+            f"({len(sink.delivered) / elapsed:,.0f}/s) as {sink.notifications} notifications"
+        )
+        print(f"{batches} batches, {queries / max(batches, 1):.2f} queries per batch")
+        print(f"dead-lettered={dead} duplicates={duplicates}")
+        for client in clients:
+            await client.aclose()
+    finally:
+        await control.delete(reminder.SCHEDULE_KEY, reminder.PROCESSING_KEY, DEAD_LETTER_KEY)
+        await control.aclose()
+        await engine.dispose()
+        await drop_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure reminder delivery throughput end to end.")
+    parser.add_argument("--reminders", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20, help="deliveries in flight per pipeline")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated time per delivery")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="share of delivery attempts that fail")
+    parser.add_argument("--backoff", type=float, default=0.05, help="retry backoff base in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,80 @@
+"""
+Measures reminder worker throughput with several concurrent workers draining
+one schedule, and checks that no reminder is delivered twice.
+
+Runs against the docker-compose Redis, on a separate logical database so the
+real schedule is never touched:
+
+    python -m benchmarks.reminder_throughput --reminders 100000 --workers 4
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import redis.asyncio as redis
+
+from app.workers import reminder
+
+BENCH_REDIS_URL = "redis://localhost:6379/15"
+
+
+async def seed(client, count: int, chunk: int = 10_000):
+    await client.delete(reminder.SCHEDULE_KEY, reminder.PROCESSING_KEY)
+    due = time.time() - 1
+    for start in range(0, count, chunk):
+        members = {str(i): due for i in range(start, min(start + chunk, count))}
+        await client.zadd(reminder.SCHEDULE_KEY, members)
+
+
+async def drained(client) -> bool:
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.zcard(reminder.SCHEDULE_KEY)
+        pipe.zcard(reminder.PROCESSING_KEY)
+        scheduled, processing = await pipe.execute()
+    return scheduled == 0 and processing == 0
+
+
+async def main(args):
+    control = redis.from_url(BENCH_REDIS_URL, decode_responses=True)
+    await seed(control, args.reminders)
+
+    delivered = Counter()
+
+    async def handler(members):
+        delivered.update(members)
+
+    stop = asyncio.Event()
+    clients = [redis.from_url(BENCH_REDIS_URL, decode_responses=True) for _ in range(args.workers)]
+    start = time.perf_counter()
+    workers = [
+        asyncio.create_task(
+            reminder.reminder_worker(
+                client, handler=handler, batch_size=args.batch_size, max_idle=0.05, stop=stop
+            )
+        )
+        for client in clients
+    ]
+    while not await drained(control):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*workers)
+
+    duplicates = sum(count - 1 for count in delivered.values() if count > 1)
+    print(
+        f"workers={args.workers} batch={args.batch_size} reminders={len(delivered)} "
+        f"in {elapsed:.2f}s ({len(delivered) / elapsed:,.0f}/s), duplicates={duplicates}"
+    )
+
+    await control.delete(reminder.SCHEDULE_KEY, reminder.PROCESSING_KEY)
+    for client in [control, *clients]:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure reminder worker throughput.")
+    parser.add_argument("--reminders", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Shows how throughput scales with the number of worker processes: for each
+worker count, starts `python -m app.serve` against a seeded scratch database
+and drives it with the read-only part of the api_load request mix.
+
+    python -m benchmarks.serve_scaling --workers 1 2 4 --duration 15
+
+The server uses Redis logical database 15, away from development data.
+Scaling stops at the number of CPUs, which the load generator shares with
+the server.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.jwt import create_access_token
+from benchmarks.api_load import BENCH_REDIS_URL, run_load, summarize
+from benchmarks.common import (
+    BENCH_DATABASE_URL,
+    create_database,
+    drop_database,
+    seed_users_and_tasks,
+    skewed_counts,
+)
+from benchmarks.task_events import wait_until_up
+
+READ_MIX = {
+    "GET /tasks/": 60,
+    "GET /tasks/?is_completed=false": 25,
+    "GET /tasks/stats": 15,
+}
+
+
+async def measure(args, workers: int, users, tokens) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": BENCH_DATABASE_URL,
+        "REDIS_URL": BENCH_REDIS_URL,
+        "SCHEMA_CHECK": "off",
+        "WEB_HOST": "127.0.0.1",
+        "WEB_PORT": str(args.port),
+        "WEB_WORKERS": str(workers),
+        "DB_CONNECTION_BUDGET": str(args.connection_budget),
+    }
+    server = subprocess.Popen([sys.executable, "-m", "app.serve"], env=env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        await wait_until_up(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            latencies, errors = await run_load(
+                client,
+                mix=READ_MIX,
+                users=users,
+                tokens=tokens,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+                seed=args.seed,
+            )
+    finally:
+        server.terminate()
+        server.wait()
+    everything = [value for values in latencies.values() for value in values]
+    return summarize(everything, sum(errors.values()), args.duration)
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    task_counts = skewed_counts(args.tasks, args.users, args.skew, rng)
+    await create_database()
+    engine = create_async_engine(BENCH_DATABASE_URL)
+    try:
+        print(f"Seeding {args.tasks} tasks across {args.users} users...")
+        await seed_users_and_tasks(engine, task_counts=task_counts, rng=rng)
+    finally:
+        await engine.dispose()
+
+    users = list(range(1, args.users + 1))
+    cum_weights, running = [], 0
+    for count in task_counts:
+        running += count + 1
+        cum_weights.append(running)
+    tokens = {user_id: create_access_token(user_id) for user_id in users}
+
+    results = {}
+    try:
+        for workers in args.workers:
+            results[workers] = await measure(args, workers, (users, cum_weights), tokens)
+            result = results[workers]
+            print(
+                f"workers={workers}: {result['rps']:.1f} req/s p50={result['p50_ms']:.1f} "
+                f"p95={result['p95_ms']:.1f} p99={result['p99_ms']:.1f} ms errors={result['errors']}"
+            )
+    finally:
+        await drop_database()
+
+    base = results[args.workers[0]]["rps"]
+    print(f"CPUs available: {os.cpu_count()}")
+    for workers, result in results.items():
+        print(f"workers={workers}: {result['rps'] / base:.2f}x the throughput of {args.workers[0]} worker(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure throughput scaling with worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--connection-budget", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8770)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""
+Load test for the GET /tasks/events change feed: holds many concurrent event
+stream connections against uvicorn workers and measures the fan-out latency
+from publishing an event to every connected client of that user receiving it.
+
+Starts its own uvicorn with --workers and TRUST_TOKEN_CLAIMS=true, so tokens
+can be minted for synthetic users without touching the users table; the
+docker-compose Postgres (for the startup migrations) and Redis must be up.
+Events are published straight to Redis, as the task write paths do.
+
+    python -m benchmarks.task_events --connections 1000 --users 200 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.core.jwt import create_access_token
+from app.db import task_events
+from app.db.redis import redis_client
+
+
+async def wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not start")
+
+
+async def listen(client: httpx.AsyncClient, user_id: int, connected: asyncio.Event, latencies: list):
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    async with client.stream("GET", "/tasks/events", headers=headers) as response:
+        response.raise_for_status()
+        connected.set()
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                event = json.loads(line[len("data: "):])
+                latencies.append((time.time() - event["sent"]) * 1000)
+
+
+async def main(args):
+    env = {**os.environ, "TRUST_TOKEN_CLAIMS": "true"}
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        await wait_until_up(base_url)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        timeout = httpx.Timeout(None, connect=30.0)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            users = [1_000_000 + i for i in range(args.users)]
+            per_user = {user_id: 0 for user_id in users}
+            latencies = []
+            flags, listeners = [], []
+            start = time.perf_counter()
+            for i in range(args.connections):
+                user_id = users[i % len(users)]
+                per_user[user_id] += 1
+                connected = asyncio.Event()
+                flags.append(connected)
+                listeners.append(asyncio.create_task(listen(client, user_id, connected, latencies)))
+            await asyncio.gather(*(flag.wait() for flag in flags))
+            connect_time = time.perf_counter() - start
+            # Let every worker finish subscribing before publishing.
+            await asyncio.sleep(0.5)
+
+            expected = 0
+            publish_start = time.perf_counter()
+            for _ in range(args.events):
+                user_id = random.choice(users)
+                expected += per_user[user_id]
+                await task_events.publish(
+                    user_id, [json.dumps({"type": "bench", "sent": time.time()})]
+                )
+                await asyncio.sleep(1 / args.rate)
+            deadline = time.monotonic() + 10
+            while len(latencies) < expected and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - publish_start
+
+            for listener in listeners:
+                listener.cancel()
+            await asyncio.gather(*listeners, return_exceptions=True)
+    finally:
+        server.terminate()
+        server.wait()
+        for user_id in users:
+            await redis_client.delete(task_events._stream_key(user_id))
+        await redis_client.aclose()
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    print(
+        f"workers={args.workers} connections={args.connections} "
+        f"({args.connections / args.workers:,.0f} per worker) connected in {connect_time:.2f}s"
+    )
+    print(
+        f"events={args.events} deliveries={len(latencies)}/{expected} in {elapsed:.2f}s  "
+        f"fan-out latency p50={quantiles[49]:.1f}ms p95={quantiles[94]:.1f}ms "
+        f"p99={quantiles[98]:.1f}ms max={max(latencies, default=0):.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the task change feed.")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200.0, help="events published per second")
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
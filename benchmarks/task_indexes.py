@@ -0,0 +1,135 @@
+"""
+Seeds a scratch database with tasks and compares query plans and latencies of
+the task listing and overdue scans before and after the
+`ix_tasks_owner_id_is_completed_id` / `ix_tasks_due_date_open` indexes.
+
+Usage (from the project root, with docker-compose services running):
+
+    python -m benchmarks.task_indexes --tasks 1000000 --users 1000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models.base import Base
+from app.models.user import User  # noqa
+from app.models.task import Task  # noqa
+from benchmarks.common import BENCH_DATABASE_URL, create_database, drop_database
+
+# Mirrors crud.get_tasks (first page of open tasks) and crud.get_overdue_tasks.
+QUERIES = {
+    "list_open_tasks": (
+        "SELECT * FROM tasks WHERE owner_id = :owner_id AND is_completed = false "
+        "ORDER BY id LIMIT 100"
+    ),
+    "list_all_tasks": "SELECT * FROM tasks WHERE owner_id = :owner_id ORDER BY id LIMIT 100",
+    "overdue_tasks": "SELECT * FROM tasks WHERE is_completed = false AND due_date < now()",
+}
+
+BEFORE_DDL = [
+    "DROP INDEX IF EXISTS ix_tasks_owner_id_is_completed_id",
+    "DROP INDEX IF EXISTS ix_tasks_due_date_open",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_title ON tasks (title)",
+]
+
+AFTER_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_tasks_owner_id_is_completed_id ON tasks (owner_id, is_completed, id)",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_due_date_open ON tasks (due_date) WHERE is_completed = false",
+    "DROP INDEX IF EXISTS ix_tasks_title",
+]
+
+
+async def seed(engine, *, users: int, tasks: int):
+    """Insert `users` users and `tasks` tasks spread across them server-side."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            text(
+                "INSERT INTO users (email, hashed_password) "
+                "SELECT 'bench' || g || '@example.com', 'x' FROM generate_series(1, :users) g"
+            ),
+            {"users": users},
+        )
+        # Roughly 70% completed, due dates spread one year either side of now.
+        await conn.execute(
+            text(
+                "INSERT INTO tasks (title, description, due_date, is_completed, owner_id) "
+                "SELECT 'Task ' || g, 'Seeded task', "
+                "now() + (random() * 730 - 365) * interval '1 day', "
+                "random() < 0.7, 1 + (g % :users) "
+                "FROM generate_series(1, :tasks) g"
+            ),
+            {"users": users, "tasks": tasks},
+        )
+
+
+async def apply(engine, statements):
+    async with engine.begin() as conn:
+        for statement in statements:
+            await conn.execute(text(statement))
+        await conn.execute(text("ANALYZE tasks"))
+
+
+async def measure(engine, *, owner_id: int, runs: int) -> dict:
+    report = {}
+    async with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            params = {"owner_id": owner_id}
+            plan = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                await conn.execute(text(sql), params)
+                timings.append((time.perf_counter() - start) * 1000)
+            report[name] = {
+                "plan": "\n".join(row[0] for row in plan),
+                "p50_ms": statistics.median(timings),
+                "max_ms": max(timings),
+            }
+    return report
+
+
+def print_report(label: str, report: dict):
+    print(f"===== {label} =====")
+    for name, result in report.items():
+        print(f"--- {name}: p50 {result['p50_ms']:.2f} ms, max {result['max_ms']:.2f} ms")
+        print(result["plan"])
+    print()
+
+
+async def main(args):
+    await create_database()
+    engine = create_async_engine(BENCH_DATABASE_URL)
+    try:
+        print(f"Seeding {args.tasks} tasks across {args.users} users...")
+        await seed(engine, users=args.users, tasks=args.tasks)
+
+        await apply(engine, BEFORE_DDL)
+        before = await measure(engine, owner_id=1, runs=args.runs)
+        print_report("before", before)
+
+        await apply(engine, AFTER_DDL)
+        after = await measure(engine, owner_id=1, runs=args.runs)
+        print_report("after", after)
+
+        for name in QUERIES:
+            print(
+                f"{name}: p50 {before[name]['p50_ms']:.2f} ms -> {after[name]['p50_ms']:.2f} ms"
+            )
+    finally:
+        await engine.dispose()
+        if not args.keep:
+            await drop_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare task query plans before and after the task indexes.")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""
+Compares database round trips and latency of single-task updates and
+deletes: the previous SELECT -> ORM mutate -> COMMIT -> refresh path against
+the owner-scoped UPDATE/DELETE ... RETURNING statements in app/db/crud.py.
+
+    python -m benchmarks.task_mutations --runs 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.db import crud
+from app.models.base import Base
+from app.models.task import Task
+from app.models.user import User
+from app.schemas.task import TaskUpdate
+from benchmarks.common import BENCH_DATABASE_URL, create_database, drop_database
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def _on_commit(self, *args):
+        self.count += 1
+
+
+async def legacy_update(db: AsyncSession, task_id: int, owner_id: int, task_in: TaskUpdate):
+    db_task = await crud.get_task(db, id=task_id)
+    assert db_task is not None and db_task.owner_id == owner_id
+    for field, value in task_in.dict(exclude_unset=True).items():
+        setattr(db_task, field, value)
+    await db.commit()
+    await db.refresh(db_task)
+    return db_task
+
+
+async def legacy_delete(db: AsyncSession, task_id: int, owner_id: int):
+    db_task = await crud.get_task(db, id=task_id)
+    assert db_task is not None and db_task.owner_id == owner_id
+    await db.delete(db_task)
+    await db.commit()
+
+
+async def current_update(db: AsyncSession, task_id: int, owner_id: int, task_in: TaskUpdate):
+    return await crud.update_task(db, id=task_id, owner_id=owner_id, task_in=task_in)
+
+
+async def current_delete(db: AsyncSession, task_id: int, owner_id: int):
+    return await crud.delete_task(db, id=task_id, owner_id=owner_id)
+
+
+async def run(engine, counter: StatementCounter, label: str, operation, task_ids, owner_id, *args):
+    timings = []
+    counter.count = 0
+    for task_id in task_ids:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            start = time.perf_counter()
+            await operation(db, task_id, owner_id, *args)
+            timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{label:16} round trips/op {counter.count / len(task_ids):.1f}  "
+        f"p50 {statistics.median(timings):.2f} ms  mean {statistics.fmean(timings):.2f} ms"
+    )
+
+
+async def main(args):
+    await create_database()
+    engine = create_async_engine(BENCH_DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            user = User(email="bench@example.com", hashed_password="x")
+            db.add(user)
+            await db.flush()
+            tasks = [Task(title=f"Task {i}", owner_id=user.id) for i in range(args.runs * 2)]
+            db.add_all(tasks)
+            await db.commit()
+            owner_id = user.id
+            task_ids = [task.id for task in tasks]
+
+        counter = StatementCounter(engine)
+        changes = TaskUpdate(is_completed=True)
+        legacy_ids, current_ids = task_ids[: args.runs], task_ids[args.runs :]
+        await run(engine, counter, "legacy update", legacy_update, legacy_ids, owner_id, changes)
+        await run(engine, counter, "single update", current_update, current_ids, owner_id, changes)
+        await run(engine, counter, "legacy delete", legacy_delete, legacy_ids, owner_id)
+        await run(engine, counter, "single delete", current_delete, current_ids, owner_id)
+    finally:
+        await engine.dispose()
+        await drop_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare single-task update/delete round trips.")
+    parser.add_argument("--runs", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -80,7 +80,7 @@ async def test_user(async_client):
         "password": "password"
     }
     response = await async_client.post("/auth/register", json=user_data)
-    assert response.status_code == 200
+    assert response.status_code == 201
     return response.json()
 
 @pytest.fixture(scope="function")
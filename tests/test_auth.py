@@ -1,6 +1,19 @@
+import asyncio
+import threading
+import time
 import pytest
 from httpx import AsyncClient
 
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import config
+from app.core.jwt import create_access_token
+from app.core import security
+from app.core.security import password_hash_queue_depth
+from app.db import crud, user_cache
+from app.db.redis import redis_client
+
 @pytest.mark.asyncio
 async def test_register_user(async_client: AsyncClient):
     """
@@ -10,7 +23,7 @@ async def test_register_user(async_client: AsyncClient):
         "email": "newuser@example.com",
         "password": "newpassword123"
     })
-    assert response.status_code == 200
+    assert response.status_code == 201
     data = response.json()
     assert data["email"] == "newuser@example.com"
     assert "id" in data
@@ -53,3 +66,143 @@ async def test_read_current_user(async_client: AsyncClient, auth_token: str):
     data = response.json()
     # Accept any email that matches the test user's email (from the fixture)
     assert "email" in data
+
+@pytest.mark.asyncio
+async def test_read_current_user_cached(async_client: AsyncClient, auth_token: str, monkeypatch):
+    """
+    Test that repeated requests resolve the same user through the principal
+    cache, and that an invalidation from another worker evicts it.
+    """
+    lookups = []
+    get_user_by_id = crud.get_user_by_id
+
+    async def counting_get_user_by_id(db, *, user_id):
+        lookups.append(user_id)
+        return await get_user_by_id(db, user_id=user_id)
+
+    monkeypatch.setattr(crud, "get_user_by_id", counting_get_user_by_id)
+    user_cache.clear()
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    first = await async_client.get("/users/me", headers=headers)
+    second = await async_client.get("/users/me", headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(lookups) == 1
+
+    # Another worker updated or deleted the user.
+    await redis_client.publish(user_cache.INVALIDATION_CHANNEL, first.json()["id"])
+    for _ in range(50):
+        await asyncio.sleep(0.02)
+        await async_client.get("/users/me", headers=headers)
+        if len(lookups) == 2:
+            break
+    assert len(lookups) == 2
+
+@pytest.mark.asyncio
+async def test_cached_and_loaded_principals_match(async_client: AsyncClient, test_user):
+    """
+    Test that a cache miss and a cache hit return the same kind of principal.
+    """
+    from tests.conftest import TEST_DATABASE_URL
+
+    user_cache.clear()
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        async with AsyncSession(engine) as db:
+            loaded = await user_cache.get_user(db, user_id=test_user["id"])
+            cached = await user_cache.get_user(db, user_id=test_user["id"])
+    finally:
+        await engine.dispose()
+    for principal in (loaded, cached):
+        assert inspect(principal).transient
+        assert (principal.id, principal.email) == (test_user["id"], test_user["email"])
+        assert principal.hashed_password is None
+
+@pytest.mark.asyncio
+async def test_user_invalidation_waits_for_commit(test_user, monkeypatch):
+    """
+    Test that a changed user is invalidated across workers only once the change is committed.
+    """
+    from tests.conftest import TEST_DATABASE_URL
+
+    invalidated = []
+
+    async def recording_invalidate_user(user_id):
+        invalidated.append(user_id)
+
+    monkeypatch.setattr(user_cache, "invalidate_user", recording_invalidate_user)
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        async with AsyncSession(engine) as db:
+            user = await crud.get_user_by_id(db, user_id=test_user["id"])
+            user.email = f"renamed_{test_user['email']}"
+            await db.flush()
+            assert invalidated == []
+            await db.rollback()
+
+            user = await crud.get_user_by_id(db, user_id=test_user["id"])
+            user.email = f"renamed_{test_user['email']}"
+            await db.flush()
+            assert invalidated == []
+            await db.commit()
+            await asyncio.gather(*user_cache._pending_invalidations)
+            assert invalidated == [test_user["id"]]
+
+            user = await crud.get_user_by_id(db, user_id=test_user["id"])
+            user.email = test_user["email"]
+            await db.commit()
+    finally:
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_token_for_unknown_user_rejected(async_client: AsyncClient):
+    """
+    Test that a validly signed token for a user that does not exist is rejected.
+    """
+    headers = {"Authorization": f"Bearer {create_access_token(987654321)}"}
+    response = await async_client.get("/users/me", headers=headers)
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_trusted_token_claims_skip_user_lookup(async_client: AsyncClient, monkeypatch):
+    """
+    Test that with TRUST_TOKEN_CLAIMS the task endpoints accept the signed claims as-is.
+    """
+    monkeypatch.setattr(config, "TRUST_TOKEN_CLAIMS", True)
+    headers = {"Authorization": f"Bearer {create_access_token(987654321)}"}
+    response = await async_client.get("/tasks/", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == []
+
+@pytest.mark.asyncio
+async def test_concurrent_logins_drain_hash_queue(async_client: AsyncClient, test_user, monkeypatch):
+    """
+    Test that concurrent logins all succeed through the bounded password
+    hashing pool, with at most PASSWORD_HASH_CONCURRENCY hashes at a time.
+    """
+    running, peak, peak_queue = 0, 0, 0
+    lock = threading.Lock()
+    verify_password = security.verify_password
+
+    def slow_verify_password(plain_password, hashed_password):
+        nonlocal running, peak, peak_queue
+        with lock:
+            running += 1
+            peak = max(peak, running)
+            peak_queue = max(peak_queue, password_hash_queue_depth())
+        time.sleep(0.05)
+        try:
+            return verify_password(plain_password, hashed_password)
+        finally:
+            with lock:
+                running -= 1
+
+    monkeypatch.setattr(security, "verify_password", slow_verify_password)
+    login_data = {"email": test_user["email"], "password": "password"}
+    responses = await asyncio.gather(
+        *(async_client.post("/auth/login", json=login_data) for _ in range(3 * config.PASSWORD_HASH_CONCURRENCY))
+    )
+    assert all(response.status_code == 200 for response in responses)
+    assert peak == config.PASSWORD_HASH_CONCURRENCY
+    assert peak_queue > 0
+    assert password_hash_queue_depth() == 0
@@ -0,0 +1,81 @@
+import json
+import logging
+import queue
+
+from app.core import config, logs
+from app.workers.reminder_sinks import DueTask, LogSink, Notification
+
+
+def _record(msg: str = "Reminder for %s", level: int = logging.WARNING) -> logging.LogRecord:
+    return logging.makeLogRecord({"name": "test", "msg": msg, "args": ("task",), "levelno": level})
+
+
+def test_sampling_keeps_a_burst_then_one_in_rate():
+    """
+    Test that a repeated template is sampled after its burst, reporting how many were skipped.
+    """
+    sampler = logs.SamplingFilter(burst=2, window=60.0, rate=3)
+    records = [_record() for _ in range(8)]
+    assert [sampler.filter(record) for record in records] == [True, True, False, False, True, False, False, True]
+    assert records[4].sampled == 2
+    assert sampler.filter(_record("Another template")) is True
+    assert sampler.filter(_record(level=logging.ERROR)) is True
+
+
+def test_full_queue_drops_records():
+    """
+    Test that logging never blocks on a full queue: the record is dropped and counted.
+    """
+    handler = logs.DroppingQueueHandler(queue.Queue(1))
+    handler.handle(_record())
+    handler.handle(_record())
+    assert handler.dropped == 1
+
+
+def test_queued_records_are_written_as_json(capsys):
+    """
+    Test that records go through the listener thread as JSON lines with extra fields and tracebacks.
+    """
+    logger = logging.getLogger("test.logs")
+    logger.propagate = False
+    logger.addHandler(logs.create_queue_handler())
+    try:
+        logger.warning("Task %d is overdue", 7, extra={"task_id": 7})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Delivery failed")
+    finally:
+        logs.stop_logging()
+        logger.handlers.clear()
+
+    first, second = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert first["message"] == "Task 7 is overdue"
+    assert first["level"] == "WARNING"
+    assert first["logger"] == "test.logs"
+    assert first["task_id"] == 7
+    assert second["level"] == "ERROR"
+    assert "ValueError: boom" in second["exc"]
+
+
+async def test_reminder_log_is_never_sampled_or_dropped(monkeypatch, capsys):
+    """
+    Test that the log sink writes every reminder, past the sampling burst and a full queue.
+    """
+    monkeypatch.setattr(config, "LOG_QUEUE_SIZE", 10)
+    count = config.LOG_SAMPLE_BURST + 50
+    logger = logging.getLogger("app.workers.reminder_sinks")
+    logger.propagate = False
+    logger.addHandler(logs.create_queue_handler())
+    sink = LogSink()
+    try:
+        for owner_id in range(count):
+            await sink.send(Notification(owner_id, "user@example.com", [DueTask(owner_id, "Due", None)]))
+    finally:
+        logs.stop_logging()
+        logger.handlers.clear()
+        logger.propagate = True
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [line["task_ids"] for line in lines] == [[owner_id] for owner_id in range(count)]
+    assert logs.dropped_records() == 0
@@ -0,0 +1,50 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import config, metrics
+from app.db import session
+from app.main import app
+
+
+@pytest.fixture
+async def metrics_client(async_client):
+    """A client whose requests go through the metrics middleware and query hooks."""
+    metrics.reset()
+    session.instrument_queries(Engine)
+    transport = ASGITransport(app=metrics.MetricsMiddleware(app))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    event.remove(Engine, "before_cursor_execute", session._before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", session._after_cursor_execute)
+    metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_request_latency_and_query_counts(metrics_client: AsyncClient, auth_token: str):
+    """
+    Test that requests are timed per route template and their queries counted.
+    """
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = await metrics_client.post("/tasks/", headers=headers, json={"title": "Measured"})
+    task_id = response.json()["id"]
+    await metrics_client.put(f"/tasks/{task_id}", headers=headers, json={"title": "Renamed"})
+
+    text = metrics.render()
+    assert 'http_request_duration_seconds_count{method="PUT",route="/tasks/{task_id}",status="200"} 1' in text
+    assert 'http_request_db_queries_count{route="/tasks/"} 1' in text
+    # Queries run inside SQLAlchemy greenlets are still attributed to the request.
+    assert 'http_request_db_queries_bucket{route="/tasks/{task_id}",le="0"} 0' in text
+    assert "db_queries_total" in text
+
+
+@pytest.mark.asyncio
+async def test_request_with_many_queries_is_flagged(metrics_client: AsyncClient, auth_token: str, monkeypatch):
+    """
+    Test that a request issuing more queries than the threshold is counted as a likely N+1.
+    """
+    monkeypatch.setattr(config, "METRICS_N_PLUS_ONE_THRESHOLD", 0)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    await metrics_client.get("/tasks/", headers=headers)
+    assert 'http_requests_n_plus_one_total{route="/tasks/"} 1' in metrics.render()
@@ -0,0 +1,139 @@
+import uuid
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from redis.exceptions import ConnectionError
+
+from app.core import config
+from app.core.load_shedding import LoadSheddingMiddleware
+from app.db import rate_limit
+from app.db.redis import redis_client
+from app.db.session import PoolStats, pool_overloaded
+from app.main import app
+
+
+@pytest.fixture
+def rate_limits(monkeypatch):
+    monkeypatch.setattr(config, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(config, "RATE_LIMIT_AUTH_BURST", 1_000)
+    monkeypatch.setattr(rate_limit, "_redis_retry_at", 0.0)
+    return monkeypatch
+
+
+@pytest.mark.asyncio
+async def test_login_is_limited_per_account(async_client: AsyncClient, test_user, rate_limits):
+    """
+    Test that login attempts beyond the burst get 429 with Retry-After, for that account only.
+    """
+    rate_limits.setattr(config, "RATE_LIMIT_LOGIN_BURST", 2)
+    rate_limits.setattr(config, "RATE_LIMIT_LOGIN_PER_MINUTE", 1.0)
+    wrong = {"email": test_user["email"], "password": "not-the-password"}
+    assert (await async_client.post("/auth/login", json=wrong)).status_code == 401
+    assert (await async_client.post("/auth/login", json=wrong)).status_code == 401
+    response = await async_client.post("/auth/login", json=wrong)
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+
+    other = {"email": f"nobody_{uuid.uuid4().hex[:8]}@example.com", "password": "password"}
+    assert (await async_client.post("/auth/login", json=other)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_limited_per_user(async_client: AsyncClient, auth_token: str, rate_limits):
+    """
+    Test that task requests beyond a user's burst get 429.
+    """
+    rate_limits.setattr(config, "RATE_LIMIT_TASKS_BURST", 3)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    statuses = [(await async_client.get("/tasks/", headers=headers)).status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_falls_back_to_local_buckets(rate_limits):
+    """
+    Test that the limiter keeps limiting in-process while Redis is unreachable.
+    """
+    async def unreachable(*args, **kwargs):
+        raise ConnectionError("down")
+
+    rate_limits.setattr(rate_limit, "_token_bucket_script", unreachable)
+    limit = rate_limit.Limit(per_minute=60.0, burst=2)
+    identity = uuid.uuid4().hex
+    assert await rate_limit.hit("test", identity, limit) == 0
+    assert await rate_limit.hit("test", identity, limit) == 0
+    assert 0 < await rate_limit.hit("test", identity, limit) <= 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_skips_redis_after_an_error(rate_limits):
+    """
+    Test that after a Redis error the next requests go straight to the local buckets, until Redis is retried.
+    """
+    attempts = []
+
+    async def unreachable(*args, **kwargs):
+        attempts.append(args)
+        raise ConnectionError("down")
+
+    rate_limits.setattr(rate_limit, "_token_bucket_script", unreachable)
+    limit = rate_limit.Limit(per_minute=60.0, burst=10)
+    identity = uuid.uuid4().hex
+    assert await rate_limit.hit("test", identity, limit) == 0
+    assert await rate_limit.hit("test", identity, limit) == 0
+    assert len(attempts) == 1
+
+    rate_limits.setattr(rate_limit, "_redis_retry_at", 1.0)
+    assert await rate_limit.hit("test", identity, limit) == 0
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_buckets_refill():
+    """
+    Test that the Redis token bucket allows the burst, then reports when the next token is due.
+    """
+    identity = uuid.uuid4().hex
+    limit = rate_limit.Limit(per_minute=6.0, burst=1)
+    try:
+        assert await rate_limit.hit("test", identity, limit) == 0
+        assert 9 < await rate_limit.hit("test", identity, limit) <= 10
+        assert 0 < await redis_client.pttl(rate_limit._key("test", identity)) <= 11_000
+    finally:
+        await redis_client.delete(rate_limit._key("test", identity))
+
+
+@pytest.mark.asyncio
+async def test_load_shedding_answers_503(auth_token: str):
+    """
+    Test that an overloaded worker sheds requests with Retry-After but still answers health checks.
+    """
+    overloaded = True
+    transport = ASGITransport(app=LoadSheddingMiddleware(app, is_overloaded=lambda: overloaded, retry_after=2))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        response = await client.get("/tasks/", headers=headers)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+        assert (await client.get("/")).status_code == 200
+        overloaded = False
+        assert (await client.get("/tasks/", headers=headers)).status_code == 200
+
+
+def test_pool_overloaded_needs_waiters_and_slow_checkouts():
+    """
+    Test that the pool counts as overloaded only while checkouts are queued behind slow waits.
+    """
+    class FakeEngine:
+        class pool:
+            stats = PoolStats()
+
+    stats = FakeEngine.pool.stats
+    for _ in range(20):
+        stats.record_wait(1.0)
+    assert not pool_overloaded(FakeEngine, 0.25)
+    stats.waiting = 3
+    assert pool_overloaded(FakeEngine, 0.25)
+    for _ in range(20):
+        stats.record_wait(0.0)
+    assert not pool_overloaded(FakeEngine, 0.25)
@@ -0,0 +1,34 @@
+import pytest
+
+from app.core import config
+from app.db.redis import create_redis_client, pipelined, pool_status
+
+
+@pytest.mark.asyncio
+async def test_client_factory_uses_configured_pool():
+    """
+    Test that clients get a bounded pool, connect only on first use and
+    disconnect it when closed.
+    """
+    client = create_redis_client(max_connections=3)
+    try:
+        assert pool_status(client) == {"max_connections": 3, "in_use": 0, "idle": 0}
+        assert client.connection_pool.connection_kwargs["socket_timeout"] == config.REDIS_SOCKET_TIMEOUT
+        assert await client.ping()
+        assert pool_status(client)["idle"] == 1
+    finally:
+        await client.aclose()
+    assert not any(conn.is_connected for conn in client.connection_pool._available_connections)
+
+
+@pytest.mark.asyncio
+async def test_pipelined_batches_preserve_order():
+    """
+    Test that batched pipelines return every reply in input order.
+    """
+    client = create_redis_client()
+    try:
+        replies = await pipelined(client, range(7), lambda pipe, i: pipe.echo(str(i)), batch_size=3)
+        assert replies == [str(i) for i in range(7)]
+    finally:
+        await client.aclose()
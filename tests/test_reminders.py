@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.redis import create_redis_client
+from app.db.reminder_schedule import DEAD_LETTER_KEY, PROCESSING_KEY, SCHEDULE_KEY
+from app.workers.reminder import ReminderPipeline, reminder_worker
+from tests.conftest import TEST_DATABASE_URL
+
+
+class RecordingSink:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts = 0
+        self.sent = []
+
+    async def send(self, notification):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("sink unavailable")
+        self.sent.append(notification)
+
+    async def aclose(self):
+        pass
+
+
+class SlowSink(RecordingSink):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    async def send(self, notification):
+        await asyncio.sleep(self.delay)
+        await super().send(notification)
+
+
+@pytest.fixture
+async def pipeline_deps():
+    engine = create_async_engine(TEST_DATABASE_URL)
+    client = create_redis_client("redis://localhost:6379/15")
+    await client.delete(DEAD_LETTER_KEY, SCHEDULE_KEY, PROCESSING_KEY)
+    yield sessionmaker(bind=engine, class_=AsyncSession), client
+    await client.delete(DEAD_LETTER_KEY, SCHEDULE_KEY, PROCESSING_KEY)
+    await client.aclose()
+    await engine.dispose()
+
+
+async def _due_tasks(async_client: AsyncClient, auth_token: str) -> list:
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    due = "2000-01-01T00:00:00Z"
+    created = (await async_client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json={"tasks": [{"title": f"Due {i}", "due_date": due} for i in range(3)]},
+    )).json()["results"]
+    ids = [item["id"] for item in created]
+    await async_client.put(f"/tasks/{ids[2]}", headers=headers, json={"is_completed": True})
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_reminders_are_grouped_per_user(async_client: AsyncClient, test_user, auth_token: str, pipeline_deps):
+    """
+    Test that a batch is delivered as one notification per user, retried, and skips completed tasks.
+    """
+    session_factory, client = pipeline_deps
+    ids = await _due_tasks(async_client, auth_token)
+    sink = RecordingSink(failures=1)
+    pipeline = ReminderPipeline(sink, client=client, session_factory=session_factory, backoff_base=0)
+
+    await pipeline([str(task_id) for task_id in ids] + ["999999999"])
+
+    assert sink.attempts == 2
+    [notification] = sink.sent
+    assert notification.email == test_user["email"]
+    assert [task.id for task in notification.tasks] == ids[:2]
+    assert await client.zcard(DEAD_LETTER_KEY) == 0
+
+
+@pytest.mark.asyncio
+async def test_undeliverable_reminders_are_dead_lettered(async_client: AsyncClient, auth_token: str, pipeline_deps):
+    """
+    Test that reminders still failing after the retries end up in the dead-letter set.
+    """
+    session_factory, client = pipeline_deps
+    ids = await _due_tasks(async_client, auth_token)
+    sink = RecordingSink(failures=100)
+    pipeline = ReminderPipeline(sink, client=client, session_factory=session_factory, retries=2, backoff_base=0)
+
+    await pipeline([str(task_id) for task_id in ids])
+
+    assert sink.attempts == 3
+    assert sorted(await client.zrange(DEAD_LETTER_KEY, 0, -1)) == sorted(str(task_id) for task_id in ids[:2])
+
+
+@pytest.mark.asyncio
+async def test_slow_deliveries_do_not_outlive_the_lease(async_client: AsyncClient, auth_token: str, pipeline_deps):
+    """
+    Test that a batch stuck on a slow sink is dead-lettered before its lease runs out, so no other worker claims it.
+    """
+    session_factory, client = pipeline_deps
+    ids = await _due_tasks(async_client, auth_token)
+    await client.zadd(SCHEDULE_KEY, {str(task_id): 0 for task_id in ids[:2]})
+    sink = SlowSink(delay=5.0)
+    pipeline = ReminderPipeline(sink, client=client, session_factory=session_factory, deadline=0.3)
+    claimed = []
+
+    async def handler(members):
+        claimed.extend(members)
+        await pipeline(members)
+
+    stop = asyncio.Event()
+    workers = [
+        asyncio.create_task(
+            reminder_worker(client, handler=handler, lease_seconds=1.0, max_idle=0.05, stop=stop)
+        )
+        for _ in range(2)
+    ]
+    await asyncio.sleep(2.0)
+    stop.set()
+    await asyncio.gather(*workers)
+
+    assert sorted(claimed) == sorted(str(task_id) for task_id in ids[:2])
+    assert sink.sent == []
+    assert sorted(await client.zrange(DEAD_LETTER_KEY, 0, -1)) == sorted(str(task_id) for task_id in ids[:2])
+    assert await client.zcard(PROCESSING_KEY) == 0
@@ -0,0 +1,11 @@
+from app import serve
+
+
+def test_pool_settings_split_the_connection_budget():
+    """
+    Test that per-worker pools never add up to more than the global budget.
+    """
+    assert serve.pool_settings(workers=4, budget=40) == {"pool_size": 5, "max_overflow": 5}
+    assert serve.pool_settings(workers=3, budget=10) == {"pool_size": 1, "max_overflow": 2}
+    # Every worker needs at least one connection, even over budget.
+    assert serve.pool_settings(workers=8, budget=4) == {"pool_size": 1, "max_overflow": 0}
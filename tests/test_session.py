@@ -0,0 +1,33 @@
+import pytest
+
+from app.core import config
+from app.db.session import create_engine_from_settings, engine, pool_status
+
+
+def test_engine_uses_configured_pool():
+    """
+    Test that the application engine is built from the pool settings with echo off.
+    """
+    assert engine.echo is config.DB_ECHO
+    status = pool_status(engine)
+    assert status["size"] == config.DB_POOL_SIZE
+    assert status["checked_out"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_status_tracks_checkouts():
+    """
+    Test that checkouts are counted and show up as in use while held.
+    """
+    from tests.conftest import TEST_DATABASE_URL
+
+    test_engine = create_engine_from_settings(TEST_DATABASE_URL, pool_size=2)
+    try:
+        async with test_engine.connect():
+            assert pool_status(test_engine)["checked_out"] == 1
+        status = pool_status(test_engine)
+        assert status["checked_out"] == 0
+        assert status["checkouts"] == 1
+        assert status["checkout_wait_seconds_total"] >= 0
+    finally:
+        await test_engine.dispose()
@@ -0,0 +1,236 @@
+import ast
+import importlib.metadata
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import alembic_runner, main
+from app.core import config
+
+# Cold start budget of one worker, measured in a fresh interpreter: importing
+# the app, running its startup hooks and serving the first request.
+IMPORT_BUDGET_SECONDS = 3.0
+STARTUP_BUDGET_SECONDS = 0.5
+FIRST_REQUEST_BUDGET_SECONDS = 0.5
+
+# Cold start budget of the reminder worker: importing it and its first
+# Redis round trip.
+WORKER_IMPORT_BUDGET_SECONDS = 1.0
+WORKER_FIRST_POLL_BUDGET_SECONDS = 0.5
+
+# Packages each entrypoint must not import at startup. The workers share
+# app.db with the API but none of its web stack; the API runs migrations
+# and webhook delivery in other processes.
+WORKER_EXCLUDED_PACKAGES = ("fastapi", "starlette", "pydantic", "passlib", "jose", "httpx", "alembic")
+API_EXCLUDED_PACKAGES = ("alembic", "httpx")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def serve():
+    from httpx import ASGITransport, AsyncClient
+    await app.router.startup()
+    started = time.perf_counter()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/")
+    response.raise_for_status()
+    return started, time.perf_counter()
+
+started, served = asyncio.run(serve())
+print(json.dumps({
+    "import": imported - start,
+    "startup": started - imported,
+    "first_request": served - started,
+}))
+"""
+
+WORKER_COLD_START_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.workers import reminder
+imported = time.perf_counter()
+asyncio.run(reminder.seconds_until_next_due(reminder.redis_client, max_idle=1.0))
+print(json.dumps({"import": imported - start, "first_poll": time.perf_counter() - imported}))
+"""
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=PROJECT_ROOT,
+        env={**os.environ, "SCHEMA_CHECK": "off"},
+    )
+
+
+def import_profile(module: str) -> dict:
+    """
+    Imports `module` in a fresh interpreter under `-X importtime` and
+    returns the cumulative import time in seconds of every module loaded.
+    """
+    profile = {}
+    for line in _run("-X", "importtime", "-c", f"import {module}").stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)", line)
+        if match:
+            profile[match.group(2)] = int(match.group(1)) / 1e6
+    return profile
+
+
+def slowest_imports(profile: dict, count: int = 15) -> str:
+    return "\n".join(
+        f"{seconds * 1000:8.1f} ms  {name}"
+        for name, seconds in sorted(profile.items(), key=lambda item: -item[1])[:count]
+    )
+
+
+@pytest.mark.parametrize(
+    "module,budget,excluded",
+    [
+        ("app.main", IMPORT_BUDGET_SECONDS, API_EXCLUDED_PACKAGES),
+        ("app.workers.reminder", WORKER_IMPORT_BUDGET_SECONDS, WORKER_EXCLUDED_PACKAGES),
+        ("app.workers.archiver", WORKER_IMPORT_BUDGET_SECONDS, WORKER_EXCLUDED_PACKAGES),
+        ("app.workers.schedule_backfill", WORKER_IMPORT_BUDGET_SECONDS, WORKER_EXCLUDED_PACKAGES),
+    ],
+)
+def test_import_profile(module, budget, excluded):
+    """
+    Test that an entrypoint imports within budget and without the packages only other processes need.
+    """
+    profile = import_profile(module)
+    unexpected = sorted({name.split(".")[0] for name in profile} & set(excluded))
+    assert not unexpected, f"{module} imports {unexpected}:\n{slowest_imports(profile)}"
+    assert profile[module] < budget, f"{module} took {profile[module]:.2f}s to import:\n{slowest_imports(profile)}"
+
+
+def _distribution(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def test_requirements_cover_app_imports():
+    """
+    Test that every third-party package imported by the service is pinned in the lean requirements.txt.
+    """
+    imported = set()
+    for path in Path(PROJECT_ROOT, "app").rglob("*.py"):
+        for node in ast.walk(ast.parse(path.read_text())):
+            if isinstance(node, ast.Import):
+                imported.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                imported.add(node.module.split(".")[0])
+    packages = importlib.metadata.packages_distributions()
+    needed = {
+        _distribution(dist)
+        for name in imported - set(sys.stdlib_module_names) - {"app"}
+        for dist in packages.get(name, [name])
+    }
+    pinned = {
+        _distribution(re.split(r"[\[=<>~ ]", line, maxsplit=1)[0])
+        for line in Path(PROJECT_ROOT, "requirements.txt").read_text().splitlines()
+        if line.strip() and not line.startswith(("#", "-"))
+    }
+    assert needed <= pinned, sorted(needed - pinned)
+
+
+def test_cold_start_budget():
+    """
+    Test that a worker imports, starts and answers its first request within budget.
+    """
+    output = _run("-c", COLD_START_SCRIPT).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    assert timings["import"] < IMPORT_BUDGET_SECONDS, timings
+    assert timings["startup"] < STARTUP_BUDGET_SECONDS, timings
+    assert timings["first_request"] < FIRST_REQUEST_BUDGET_SECONDS, timings
+
+
+def test_worker_cold_start_budget():
+    """
+    Test that the reminder worker imports and polls Redis for the first time within budget.
+    """
+    output = _run("-c", WORKER_COLD_START_SCRIPT).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    assert timings["import"] < WORKER_IMPORT_BUDGET_SECONDS, timings
+    assert timings["first_poll"] < WORKER_FIRST_POLL_BUDGET_SECONDS, timings
+
+
+@pytest.mark.asyncio
+async def test_check_schema_compares_with_head():
+    """
+    Test that the startup schema check spots a database that is not at head.
+    """
+    from tests.conftest import TEST_DATABASE_URL
+
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        # The test database is built with create_all, so it has no revision.
+        assert "no revision" in await alembic_runner.check_schema(engine)
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) PRIMARY KEY)"))
+            for head in alembic_runner.head_revisions():
+                await conn.execute(text("INSERT INTO alembic_version VALUES (:v)"), {"v": head})
+        assert await alembic_runner.check_schema(engine) is None
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_migrations_target_database_url(monkeypatch):
+    """
+    Test that the migration runner upgrades the database in DATABASE_URL, the
+    one the schema check reads.
+    """
+    from tests.conftest import MAINTENANCE_DB_URL, TEST_DATABASE_URL
+
+    database = "test_taskdb_migrations"
+    url = TEST_DATABASE_URL.rsplit("/", 1)[0] + f"/{database}"
+    maintenance = create_async_engine(MAINTENANCE_DB_URL, isolation_level="AUTOCOMMIT")
+    async with maintenance.connect() as conn:
+        await conn.execute(text(f"DROP DATABASE IF EXISTS {database} WITH (FORCE)"))
+        await conn.execute(text(f"CREATE DATABASE {database}"))
+    monkeypatch.setattr(config, "DATABASE_URL", url)
+    engine = create_async_engine(url)
+    try:
+        assert alembic_runner.sync_database_url().startswith("postgresql+psycopg2://")
+        alembic_runner.run_migrations()
+        assert await alembic_runner.check_schema(engine) is None
+    finally:
+        await engine.dispose()
+        async with maintenance.connect() as conn:
+            await conn.execute(text(f"DROP DATABASE {database} WITH (FORCE)"))
+        await maintenance.dispose()
+
+
+@pytest.mark.asyncio
+async def test_startup_checks_schema_instead_of_migrating(monkeypatch):
+    """
+    Test that workers refuse to start on an outdated schema without migrating it.
+    """
+    def fail():
+        raise AssertionError("workers must not run migrations")
+
+    async def outdated(engine):
+        return "Database schema is at no revision"
+
+    monkeypatch.setattr(alembic_runner, "run_migrations", fail)
+    monkeypatch.setattr(alembic_runner, "check_schema", outdated)
+    monkeypatch.setattr(config, "SCHEMA_CHECK", "fail")
+    with pytest.raises(RuntimeError, match="no revision"):
+        await main.check_database_schema()
+
+    monkeypatch.setattr(config, "SCHEMA_CHECK", "warn")
+    await main.check_database_schema()
@@ -1,6 +1,15 @@
+import asyncio
+import json
+import uuid
 import pytest
+from datetime import datetime, timezone
 from httpx import AsyncClient
 
+from app.core import config
+from app.db.redis import redis_client
+from app.db import listing_cache, task_events, task_stats
+from app.db.reminder_schedule import SCHEDULE_KEY
+
 @pytest.mark.asyncio
 async def test_create_task(async_client: AsyncClient, auth_token: str):
     """Test creating a new task as an authenticated user."""
@@ -10,8 +19,470 @@ async def test_create_task(async_client: AsyncClient, auth_token: str):
         "description": "This is a test task."
     }
     response = await async_client.post("/tasks/", headers=headers, json=task_data)
-    assert response.status_code == 200
+    assert response.status_code == 201
     data = response.json()
     assert data["title"] == task_data["title"]
     assert data["description"] == task_data["description"]
     assert "id" in data
+
+@pytest.mark.asyncio
+async def test_list_tasks_keyset_pagination(async_client: AsyncClient, auth_token: str):
+    """Test walking the task listing page by page with the next-page cursor."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for i in range(5):
+        await async_client.post("/tasks/", headers=headers, json={"title": f"Task {i}"})
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = await async_client.get("/tasks/", headers=headers, params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(task["id"] for task in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 2, "after": cursor}
+
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+@pytest.mark.asyncio
+async def test_list_tasks_invalid_cursor(async_client: AsyncClient, auth_token: str):
+    """Test that a malformed cursor is rejected."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = await async_client.get("/tasks/", headers=headers, params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_tasks_stream_ndjson(async_client: AsyncClient, auth_token: str):
+    """Test streaming the task listing as newline-delimited JSON."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for i in range(3):
+        await async_client.post("/tasks/", headers=headers, json={"title": f"Streamed {i}"})
+
+    response = await async_client.get("/tasks/", headers=headers, params={"stream": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [task["title"] for task in lines] == [f"Streamed {i}" for i in range(3)]
+
+    response = await async_client.get("/tasks/", headers=headers, params={"stream": "true", "limit": 1})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_bulk_create_update_delete(async_client: AsyncClient, auth_token: str):
+    """Test creating, completing and deleting tasks through the bulk endpoints."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = await async_client.post("/tasks/bulk", headers=headers, json={
+        "tasks": [{"title": f"Bulk {i}"} for i in range(3)]
+    })
+    assert response.status_code == 201
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["created"] * 3
+    assert [r["task"]["title"] for r in results] == ["Bulk 0", "Bulk 1", "Bulk 2"]
+    ids = [r["id"] for r in results]
+
+    missing_id = max(ids) + 100000
+    response = await async_client.patch("/tasks/bulk", headers=headers, json={
+        "ids": ids + [missing_id], "changes": {"is_completed": True}
+    })
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["updated"] * 3 + ["not_found"]
+    assert all(r["task"]["is_completed"] for r in results[:3])
+
+    response = await async_client.request("DELETE", "/tasks/bulk", headers=headers, json={
+        "ids": ids + [missing_id]
+    })
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["deleted"] * 3 + ["not_found"]
+
+    listing = await async_client.get("/tasks/", headers=headers)
+    assert not set(ids) & {task["id"] for task in listing.json()}
+
+@pytest.mark.asyncio
+async def test_update_and_delete_task_ownership(async_client: AsyncClient, auth_token: str):
+    """Test updating and deleting a task, and the 404/403 responses on the miss path."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task = (await async_client.post("/tasks/", headers=headers, json={"title": "Mine"})).json()
+
+    response = await async_client.put(f"/tasks/{task['id']}", headers=headers, json={"is_completed": True})
+    assert response.status_code == 200
+    assert response.json()["is_completed"] is True
+    assert response.json()["title"] == "Mine"
+
+    response = await async_client.put("/tasks/999999999", headers=headers, json={"title": "Nope"})
+    assert response.status_code == 404
+
+    other = {"email": f"other_{uuid.uuid4().hex[:8]}@example.com", "password": "password"}
+    await async_client.post("/auth/register", json=other)
+    other_token = (await async_client.post("/auth/login", json=other)).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {other_token}"}
+
+    response = await async_client.put(f"/tasks/{task['id']}", headers=other_headers, json={"title": "Stolen"})
+    assert response.status_code == 403
+    response = await async_client.delete(f"/tasks/{task['id']}", headers=other_headers)
+    assert response.status_code == 403
+
+    response = await async_client.delete(f"/tasks/{task['id']}", headers=headers)
+    assert response.status_code == 204
+    response = await async_client.delete(f"/tasks/{task['id']}", headers=headers)
+    assert response.status_code == 204
+
+@pytest.mark.asyncio
+async def test_task_writes_maintain_reminder_schedule(async_client: AsyncClient, auth_token: str):
+    """Test that scheduling follows the task's due date and completion."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task = (await async_client.post("/tasks/", headers=headers, json={
+        "title": "Due soon", "due_date": "2030-01-01T09:00:00+00:00"
+    })).json()
+    member = str(task["id"])
+    score = await redis_client.zscore(SCHEDULE_KEY, member)
+    assert score == datetime(2030, 1, 1, 9, tzinfo=timezone.utc).timestamp()
+
+    await async_client.put(f"/tasks/{task['id']}", headers=headers, json={"is_completed": True})
+    assert await redis_client.zscore(SCHEDULE_KEY, member) is None
+
+    await async_client.put(f"/tasks/{task['id']}", headers=headers, json={"is_completed": False})
+    assert await redis_client.zscore(SCHEDULE_KEY, member) is not None
+
+    await async_client.delete(f"/tasks/{task['id']}", headers=headers)
+    assert await redis_client.zscore(SCHEDULE_KEY, member) is None
+
+@pytest.mark.asyncio
+async def test_list_tasks_conditional_get(async_client: AsyncClient, auth_token: str, monkeypatch):
+    """Test that unchanged listings answer If-None-Match with 304 until a task changes."""
+    monkeypatch.setattr(config, "LISTING_ETAGS", True)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    await async_client.post("/tasks/", headers=headers, json={"title": "Polled"})
+
+    first = await async_client.get("/tasks/", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = await async_client.get("/tasks/", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+    filtered = await async_client.get(
+        "/tasks/", headers={**headers, "If-None-Match": etag}, params={"is_completed": "true"}
+    )
+    assert filtered.status_code == 200
+
+    await async_client.post("/tasks/", headers=headers, json={"title": "Changed"})
+    changed = await async_client.get("/tasks/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert [task["title"] for task in changed.json()] == ["Polled", "Changed"]
+
+@pytest.mark.asyncio
+async def test_failed_version_bump_drops_the_version():
+    """Test that a listing version that cannot be replaced is deleted, so old ETags stop matching."""
+    from redis.exceptions import ConnectionError
+
+    class SetFails:
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("down")
+
+        def __getattr__(self, name):
+            return getattr(redis_client, name)
+
+    owner_id = 987654322
+    version = await listing_cache.get_version(owner_id)
+    await listing_cache.bump_version(owner_id, client=SetFails())
+    assert await listing_cache.get_version(owner_id) != version
+    assert 0 < await redis_client.ttl(listing_cache._version_key(owner_id)) <= listing_cache.VERSION_TTL_SECONDS
+
+@pytest.mark.asyncio
+async def test_list_tasks_fast_json_matches_default(async_client: AsyncClient, auth_token: str, monkeypatch):
+    """Test that the orjson row path returns the same listing as the Pydantic path."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    await async_client.post("/tasks/", headers=headers, json={
+        "title": "Serialized", "description": "Both ways", "due_date": "2030-01-01T09:00:00+00:00"
+    })
+    monkeypatch.setattr(config, "LISTING_CACHE_BACKEND", "none")
+
+    default = await async_client.get("/tasks/", headers=headers)
+    monkeypatch.setattr(config, "FAST_JSON", True)
+    fast = await async_client.get("/tasks/", headers=headers)
+    streamed = await async_client.get("/tasks/", headers=headers, params={"stream": "true"})
+
+    assert fast.status_code == 200
+    assert fast.json() == default.json()
+    assert [json.loads(line) for line in streamed.text.splitlines()] == default.json()
+
+@pytest.mark.asyncio
+async def test_list_tasks_filters_sort_and_search(async_client: AsyncClient, auth_token: str):
+    """Test due date range, overdue, full-text search and due date ordering."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for title, description, due_date in [
+        ("Pay rent", "Transfer to the landlord", "2000-01-01T00:00:00+00:00"),
+        ("Buy groceries", "Milk and eggs", "2030-03-01T00:00:00+00:00"),
+        ("Call plumber", None, "2030-02-01T00:00:00+00:00"),
+        ("Read a book", "Something about landlords", None),
+    ]:
+        await async_client.post("/tasks/", headers=headers, json={
+            "title": title, "description": description, "due_date": due_date
+        })
+
+    async def titles(**params):
+        response = await async_client.get("/tasks/", headers=headers, params=params)
+        assert response.status_code == 200
+        return [task["title"] for task in response.json()]
+
+    assert await titles(overdue="true") == ["Pay rent"]
+    assert await titles(due_after="2030-01-01T00:00:00Z", due_before="2030-02-15T00:00:00Z") == ["Call plumber"]
+    assert await titles(q="landlord") == ["Pay rent", "Read a book"]
+    assert await titles(q="eggs") == ["Buy groceries"]
+    assert await titles(sort="due_date") == ["Pay rent", "Call plumber", "Buy groceries", "Read a book"]
+
+    seen = []
+    params = {"sort": "due_date", "limit": 1}
+    first_cursor = None
+    while True:
+        response = await async_client.get("/tasks/", headers=headers, params=params)
+        seen.extend(task["title"] for task in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        first_cursor = first_cursor or cursor
+        params = {"sort": "due_date", "limit": 1, "after": cursor}
+    assert seen == ["Pay rent", "Call plumber", "Buy groceries", "Read a book"]
+
+    response = await async_client.get("/tasks/", headers=headers, params={"after": first_cursor})
+    assert response.status_code == 400
+
+    for q in ["", "x" * 201]:
+        response = await async_client.get("/tasks/", headers=headers, params={"q": q})
+        assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_task_stats(async_client: AsyncClient, auth_token: str):
+    """Test the aggregate counts and the due date histogram."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for title, due in [
+        ("Past", "2020-01-06T10:00:00Z"),
+        ("Same week", "2020-01-08T10:00:00Z"),
+        ("Future", "2999-01-01T10:00:00Z"),
+        ("No due date", None),
+    ]:
+        await async_client.post("/tasks/", headers=headers, json={"title": title, "due_date": due})
+    listing = (await async_client.get("/tasks/", headers=headers)).json()
+    done = next(task["id"] for task in listing if task["title"] == "Same week")
+    await async_client.put(f"/tasks/{done}", headers=headers, json={"is_completed": True})
+
+    response = await async_client.get("/tasks/stats", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats == {
+        "total": 4, "open": 3, "completed": 1, "overdue": 1, "bucket": None, "histogram": [],
+    }
+
+    response = await async_client.get("/tasks/stats", headers=headers, params={"bucket": "week"})
+    assert response.json()["histogram"] == [
+        {"start": "2020-01-06", "open": 1, "completed": 1},
+        {"start": "2998-12-31", "open": 1, "completed": 0},
+    ]
+    response = await async_client.get("/tasks/stats", headers=headers, params={"bucket": "month"})
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_task_stats_counters_follow_writes(async_client: AsyncClient, test_user, auth_token: str, monkeypatch):
+    """Test that the Redis counters stay in line with the database across writes."""
+    monkeypatch.setattr(config, "TASK_STATS_COUNTERS", True)
+    # User ids restart with the test database, but Redis keeps its keys.
+    await redis_client.delete(*task_stats._keys(test_user["id"]))
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    await async_client.post("/tasks/", headers=headers, json={"title": "Overdue", "due_date": "2020-01-01T00:00:00Z"})
+    # The first read loads the counters from the database.
+    first = (await async_client.get("/tasks/stats", headers=headers)).json()
+    assert (first["open"], first["completed"], first["overdue"]) == (1, 0, 1)
+
+    response = await async_client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json={"tasks": [{"title": f"Bulk {i}", "due_date": "2020-01-01T00:00:00Z"} for i in range(3)]},
+    )
+    ids = [item["id"] for item in response.json()["results"]]
+    await async_client.patch(
+        "/tasks/bulk", headers=headers, json={"ids": ids[:2], "changes": {"is_completed": True}}
+    )
+    await async_client.delete(f"/tasks/{ids[0]}", headers=headers)
+    await async_client.request("DELETE", "/tasks/bulk", headers=headers, json={"ids": [ids[2]]})
+
+    cached = (await async_client.get("/tasks/stats", headers=headers)).json()
+    monkeypatch.setattr(config, "TASK_STATS_COUNTERS", False)
+    fresh = (await async_client.get("/tasks/stats", headers=headers)).json()
+    assert cached == fresh
+    assert (fresh["open"], fresh["completed"], fresh["overdue"]) == (1, 1, 1)
+
+@pytest.mark.asyncio
+async def test_task_events_feed(async_client: AsyncClient, test_user, auth_token: str):
+    """Test that task writes reach live listeners and can be replayed from an event id."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    owner_id = test_user["id"]
+    await redis_client.delete(task_events._stream_key(owner_id))
+    async with task_events.subscribe(owner_id) as subscription:
+        response = await async_client.post("/tasks/", headers=headers, json={"title": "Live"})
+        task_id = response.json()["id"]
+        await async_client.put(f"/tasks/{task_id}", headers=headers, json={"is_completed": True})
+        await async_client.delete(f"/tasks/{task_id}", headers=headers)
+        live = [await subscription.get(timeout=5) for _ in range(3)]
+
+    events = [json.loads(data) for _, data in live]
+    assert [event["type"] for event in events] == ["created", "completed", "deleted"]
+    assert events[0]["task"]["title"] == "Live"
+    assert events[2]["id"] == task_id
+
+    first_id = live[0][0]
+    replay = await task_events.history(owner_id, first_id)
+    assert replay == live[1:]
+    assert await task_events.history(owner_id, "0-0") is None
+
+    response = await async_client.get(
+        "/tasks/events", headers={**headers, "Last-Event-ID": "not-an-id"}
+    )
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_task_events_history_unavailable(monkeypatch):
+    """Test that unreadable history asks the client to reload instead of failing the stream."""
+    from redis.asyncio.retry import Retry
+    from redis.backoff import NoBackoff
+
+    from app.db.redis import create_redis_client
+
+    client = create_redis_client("redis://localhost:1", retry=Retry(NoBackoff(), 0))
+    monkeypatch.setattr(task_events, "redis_client", client)
+    try:
+        assert await task_events.history(1, "1-0") is None
+    finally:
+        await client.aclose()
+
+@pytest.mark.asyncio
+async def test_task_events_feed_survives_idle_periods(monkeypatch):
+    """Test that a quiet feed outlives the Redis socket timeout and still delivers events."""
+    from redis.asyncio.retry import Retry
+    from redis.backoff import NoBackoff
+
+    from app.db.redis import create_redis_client
+
+    # Without retries a socket timeout on the subscription would surface
+    # instead of being hidden by a reconnect.
+    client = create_redis_client(socket_timeout=0.2, retry=Retry(NoBackoff(), 0))
+    monkeypatch.setattr(task_events, "redis_client", client)
+    owner_id = 987654320
+    try:
+        async with task_events.subscribe(owner_id) as subscription:
+            assert await subscription.get(timeout=1.5) is None
+            assert not subscription.lost.is_set()
+
+            await task_events.publish(owner_id, [task_events.deleted_event(1)])
+            event = await subscription.get(timeout=5)
+        assert event is not None
+        assert json.loads(event[1]) == {"type": "deleted", "id": 1}
+    finally:
+        await client.aclose()
+
+@pytest.mark.asyncio
+async def test_task_events_listener_restart():
+    """Test that a listener joining while the last one leaves gets a live subscription."""
+    owner_id = 987654321
+    async with task_events.subscribe(owner_id):
+        pass
+    # The cancelled subscription has not finished yet when the next one starts.
+    async with task_events.subscribe(owner_id) as subscription:
+        await redis_client.publish(f"{task_events.CHANNEL_PREFIX}not-an-owner", "1-0 {}")
+        await task_events.publish(owner_id, [task_events.deleted_event(1)])
+        event = await subscription.get(timeout=5)
+    assert event is not None
+    assert json.loads(event[1]) == {"type": "deleted", "id": 1}
+
+@pytest.mark.asyncio
+async def test_create_task_idempotency_key(async_client: AsyncClient, auth_token: str):
+    """Test that retries and concurrent duplicates with one Idempotency-Key create a single task."""
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": uuid.uuid4().hex}
+    first = await async_client.post("/tasks/", headers=headers, json={"title": "Pay rent"})
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = await async_client.post("/tasks/", headers=headers, json={"title": "Pay rent"})
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+    reused = await async_client.post("/tasks/", headers=headers, json={"title": "Pay the plumber"})
+    assert reused.status_code == 422
+    listing = await async_client.get("/tasks/", headers={"Authorization": headers["Authorization"]})
+    assert "Pay the plumber" not in {task["title"] for task in listing.json()}
+
+    headers["Idempotency-Key"] = uuid.uuid4().hex
+    responses = await asyncio.gather(
+        *(async_client.post("/tasks/", headers=headers, json={"title": "Call landlord"}) for _ in range(5))
+    )
+    assert {response.status_code for response in responses} == {201}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum("Idempotent-Replayed" not in response.headers for response in responses) == 1
+
+    # Keys are scoped to their owner.
+    other = {"email": f"other_{uuid.uuid4().hex[:8]}@example.com", "password": "password"}
+    await async_client.post("/auth/register", json=other)
+    other_token = (await async_client.post("/auth/login", json=other)).json()["access_token"]
+    response = await async_client.post(
+        "/tasks/",
+        headers={"Authorization": f"Bearer {other_token}", "Idempotency-Key": headers["Idempotency-Key"]},
+        json={"title": "Call landlord"},
+    )
+    assert "Idempotent-Replayed" not in response.headers
+    assert response.json()["id"] != responses[0].json()["id"]
+
+@pytest.mark.asyncio
+async def test_archive_completed_tasks(async_client: AsyncClient, auth_token: str):
+    """Test that long-completed tasks move to the archive in batches and are listed from there."""
+    from sqlalchemy import select, update
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from app.db import crud
+    from app.models.task import Task as TaskModel
+    from app.workers.archiver import ensure_partitions
+    from tests.conftest import TEST_DATABASE_URL
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    created = (await async_client.post(
+        "/tasks/bulk", headers=headers, json={"tasks": [{"title": f"Old {i}"} for i in range(3)] + [{"title": "Open"}]}
+    )).json()["results"]
+    ids = [item["id"] for item in created]
+    await async_client.patch("/tasks/bulk", headers=headers, json={"ids": ids[:3], "changes": {"is_completed": True}})
+
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        await ensure_partitions(engine)
+        async with AsyncSession(engine) as db:
+            stamps = (await db.execute(select(TaskModel.completed_at).where(TaskModel.id.in_(ids)))).scalars().all()
+            assert sum(stamp is not None for stamp in stamps) == 3
+            await db.execute(
+                update(TaskModel)
+                .where(TaskModel.id.in_(ids[:3]))
+                .values(completed_at=datetime(2000, 1, 1, tzinfo=timezone.utc))
+            )
+            await db.commit()
+            cutoff = datetime(2000, 1, 2, tzinfo=timezone.utc)
+            first = await crud.archive_completed_tasks(db, completed_before=cutoff, batch_size=2)
+            second = await crud.archive_completed_tasks(db, completed_before=cutoff, batch_size=2)
+            assert (len(first), len(second)) == (2, 1)
+    finally:
+        await engine.dispose()
+
+    listed = [task["id"] for task in (await async_client.get("/tasks/", headers=headers)).json()]
+    assert ids[3] in listed and not set(ids[:3]) & set(listed)
+
+    page = await async_client.get("/tasks/archive", headers=headers, params={"limit": 2})
+    assert [task["id"] for task in page.json()] == ids[:2]
+    assert page.json()[0]["completed_at"].startswith("2000-01-01")
+    page = await async_client.get(
+        "/tasks/archive", headers=headers, params={"limit": 2, "after": page.headers["X-Next-Cursor"]}
+    )
+    assert [task["id"] for task in page.json()] == ids[2:3]
+    assert "X-Next-Cursor" not in page.headers